@@ -1,24 +1,199 @@
 # api/auth_routes.py
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, after_this_request, current_app, g, request
+from sqlalchemy import event, update
+from sqlalchemy.orm import load_only, make_transient_to_detached
 from services.db_config import db
+from services.ttl_cache import TTLCache
 from models.user import User
 from functools import wraps
 from datetime import datetime, timedelta
+import hmac
 import logging
+import time
 import jwt
+import orjson
+from jwt.algorithms import HMACAlgorithm
 
 from config.settings import SECRET_KEY
 
+_SECRET_KEY_BYTES = SECRET_KEY.encode()
+
 logger = logging.getLogger(__name__)
 auth = Blueprint('auth', __name__)
 
 
+class _HS256Algorithm(HMACAlgorithm):
+    """HS256 via hmac.digest(), C-implementationen i ett anrop utan HMAC-objekt per token."""
+
+    def __init__(self):
+        super().__init__(HMACAlgorithm.SHA256)
+        self._prepared_keys = {}
+
+    def prepare_key(self, key):
+        # prepare_key() kör PEM/SSH/DER/JWK-kontroller (inkl. json.loads) på
+        # nyckeln vid varje encode/decode; samma SECRET_KEY kontrolleras en gång.
+        prepared = self._prepared_keys.get(key)
+        if prepared is None:
+            prepared = super().prepare_key(key)
+            if len(self._prepared_keys) < 8:
+                self._prepared_keys[key] = prepared
+        return prepared
+
+    def sign(self, msg, key):
+        return hmac.digest(key, msg, "sha256")
+
+
+# verify() i HMACAlgorithm jämför med hmac.compare_digest mot sign(), så
+# både encode och decode går via snabbvägen.
+jwt.unregister_algorithm("HS256")
+jwt.register_algorithm("HS256", _HS256Algorithm())
+
+
+class _OrjsonJWT(jwt.PyJWT):
+    """PyJWT med orjson för payload; _encode_payload/_decode_payload är PyJWT:s egna override-punkter."""
+
+    def _encode_payload(self, payload, headers=None, json_encoder=None):
+        if json_encoder is not None:
+            return super()._encode_payload(payload, headers, json_encoder)
+        return orjson.dumps(payload)
+
+    def _decode_payload(self, decoded):
+        try:
+            payload = orjson.loads(decoded["payload"])
+        except orjson.JSONDecodeError as e:
+            raise jwt.DecodeError(f"Invalid payload string: {e}") from e
+        if not isinstance(payload, dict):
+            raise jwt.DecodeError("Invalid payload string: must be a json object")
+        return payload
+
+
+_jwt = _OrjsonJWT()
+# Dela den globala PyJWS-instansen så att HS256-registreringen ovan gäller.
+# Både detta och override-punkterna ovan är PyJWT-internals: versionen är
+# därför pinnad i requirements.txt (testad mot 2.10.1 och 2.15.1), och
+# test_issued_token_roundtrips_with_stock_pyjwt fångar ett brott vid uppgradering.
+_jwt._jws = jwt.api_jws._jws_global_obj
+
+
+def _json_response(obj, status_code):
+    # orjson serialiserar direkt till bytes och är betydligt snabbare än
+    # stdlib-json bakom jsonify för stora listor (t.ex. /events).
+    return current_app.response_class(
+        orjson.dumps(obj), status=status_code, mimetype="application/json"
+    )
+
+
 def success_response(data=None, status_code=200):
-    return jsonify({"success": True, "data": data if data is not None else {}, "error": None}), status_code
+    return _json_response({"success": True, "data": data if data is not None else {}, "error": None}, status_code)
 
 
 def error_response(message, status_code=400, data=None):
-    return jsonify({"success": False, "data": data, "error": message}), status_code
+    return _json_response({"success": False, "data": data, "error": message}, status_code)
+
+# ---- User-cache för token_required ----
+# Varje autentiserad request slog tidigare upp användaren i DB. Vi cachar en
+# ögonblicksbild av kolumnvärdena en kort stund och återansluter den till
+# sessionen utan SELECT (merge med load=False).
+_USER_CACHE = TTLCache(maxsize=10_000, ttl=30)
+# Auth-vägen behöver bara det som to_dict() visar; password_hash (den
+# största kolumnen) laddas lat om någon handler faktiskt rör den.
+_AUTH_USER_COLUMNS = (User.id, User.username, User.email, User.created_at, User.last_login)
+_USER_ATTRS = tuple(col.key for col in _AUTH_USER_COLUMNS)
+
+
+def _get_user_cached(user_id):
+    snapshot = _USER_CACHE.get(user_id)
+    if snapshot is None:
+        user = db.session.get(User, user_id, options=[load_only(*_AUTH_USER_COLUMNS)])
+        if user is not None:
+            _USER_CACHE.set(user_id, {key: getattr(user, key) for key in _USER_ATTRS})
+        return user
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _evict_cached_user(mapper, connection, target):
+    # Ändringar via ORM (lösenord, e-post, borttagning) får inte ligga kvar i
+    # cachen i upp till TTL; Core-uppdateringar poppar cachen själva.
+    _USER_CACHE.pop(target.id)
+
+
+def _get_request_user(user_id):
+    """Request-scoped memo: the authenticated user is fetched at most once per request."""
+    if g.get("_auth_user_id") == user_id:
+        return g._auth_user
+    user = _get_user_cached(user_id)
+    if user is not None:
+        g._auth_user = user
+        g._auth_user_id = user_id
+    return user
+
+# ---- Tokens ----
+# All JWT-hantering går via PyJWT (med HS256-snabbvägen ovan).
+_JWT_ALGORITHMS = ["HS256"]
+TOKEN_LIFETIME = timedelta(days=7)
+_TOKEN_LIFETIME_SECONDS = int(TOKEN_LIFETIME.total_seconds())
+
+
+def _issue_token(user):
+    # Epoch-sekunder direkt från time.time(); PyJWT skulle annars göra om
+    # datetime-värdet till en timestamp via utctimetuple().
+    return _jwt.encode(
+        {
+            'user_id': user.id,
+            'username': user.username,
+            'exp': int(time.time()) + _TOKEN_LIFETIME_SECONDS
+        },
+        _SECRET_KEY_BYTES,
+        algorithm="HS256"
+    )
+
+# ---- Cache för verifierade tokens ----
+# Klienter återanvänder samma bearer-token för många requests; en träff här
+# hoppar över base64 + HMAC + JSON-parsning. Poster lever aldrig längre än
+# tokenens egen exp.
+_TOKEN_CACHE = TTLCache(maxsize=4096, ttl=300)
+
+
+def _decode_token(token):
+    payload = _TOKEN_CACHE.get(token)
+    if payload is not None:
+        return payload
+    payload = _jwt.decode(token, _SECRET_KEY_BYTES, algorithms=_JWT_ALGORITHMS)
+    exp = payload.get("exp")
+    ttl = None if exp is None else min(exp - time.time(), _TOKEN_CACHE.ttl)
+    if ttl is None or ttl > 0:
+        _TOKEN_CACHE.set(token, payload, ttl=ttl)
+    return payload
+
+# ---- last_login utanför login-svarets kritiska väg ----
+# Inloggningar tätare än så här skriver inte om last_login alls.
+LAST_LOGIN_THROTTLE = timedelta(minutes=5)
+
+
+def _defer_last_login_update(user_id, login_time):
+    """Skriv last_login först när svaret har skickats (Response.call_on_close)."""
+    app = current_app._get_current_object()
+
+    def _update():
+        with app.app_context():
+            try:
+                db.session.execute(
+                    update(User).where(User.id == user_id).values(last_login=login_time)
+                )
+                db.session.commit()
+                _USER_CACHE.pop(user_id, None)
+            except Exception as e:
+                logger.error(f"last_login update failed: {str(e)}")
+                db.session.rollback()
+
+    @after_this_request
+    def _schedule(response):
+        response.call_on_close(_update)
+        return response
 
 # ---- Auth-dekorator (OPTIONS passas vidare utan validering) ----
 def token_required(f):
@@ -29,11 +204,11 @@ def token_required(f):
         if not token:
             return error_response('Authentication token is missing', 401)
         try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+            data = _decode_token(token)
             user_id = data.get('user_id')
             if not user_id:
                 return error_response('Invalid authentication token', 401)
-            user = User.query.filter_by(id=user_id).first()
+            user = _get_request_user(user_id)
             if not user:
                 return error_response('Invalid authentication token', 401)
         except Exception as e:
@@ -56,19 +231,14 @@ def login():
         if not user or not user.check_password(password):
             return error_response('Invalid credentials', 401)
 
-        user.last_login = datetime.utcnow()
-        db.session.commit()
+        user_data = user.to_dict()
+        login_time = datetime.utcnow()
+        if user.last_login is None or login_time - user.last_login > LAST_LOGIN_THROTTLE:
+            _defer_last_login_update(user.id, login_time)
+            user_data['last_login'] = login_time.isoformat()
 
-        token = jwt.encode(
-            {
-                'user_id': user.id,
-                'username': user.username,
-                'exp': datetime.utcnow() + timedelta(days=7)
-            },
-            SECRET_KEY,
-            algorithm="HS256"
-        )
-        return success_response({'token': token, 'user': user.to_dict()})
+        token = _issue_token(user)
+        return success_response({'token': token, 'user': user_data})
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         return error_response('Login failed', 500)
@@ -95,15 +265,7 @@ def register():
         db.session.add(new_user)
         db.session.commit()
 
-        token = jwt.encode(
-            {
-                'user_id': new_user.id,
-                'username': new_user.username,
-                'exp': datetime.utcnow() + timedelta(days=7)
-            },
-            SECRET_KEY,
-            algorithm="HS256"
-        )
+        token = _issue_token(new_user)
         return success_response({'token': token, 'user': new_user.to_dict()}, 201)
     except Exception as e:
         logger.error(f"Registration error: {str(e)}")
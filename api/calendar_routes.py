@@ -1,34 +1,88 @@
 # api/calendar_routes.py
-from flask import Blueprint, jsonify, request
-from services.db_config import db
+from flask import Blueprint, current_app, request, stream_with_context
+from sqlalchemy import select
+from services.db_config import db, upsert
 from models.calendar import CalendarEvent, DayNote
-from api.auth_routes import token_required
-from datetime import datetime, timezone, date
+from api.auth_routes import token_required, success_response, error_response
+from datetime import datetime, timedelta, date
+from functools import lru_cache
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 calendar_api = Blueprint('calendar_api', __name__)
 
-
-def success_response(data=None, status_code=200):
-    return jsonify({"success": True, "data": data if data is not None else {}, "error": None}), status_code
-
-
-def error_response(message, status_code=400, data=None):
-    return jsonify({"success": False, "data": data, "error": message}), status_code
-
 # --- Hjälpare för tidskonvertering (lagras som "naive UTC" i DB) ---
+_EPOCH = datetime(1970, 1, 1)
+
 def ms_to_naive_utc(ms):
     """ms (epoch) -> naive UTC datetime"""
-    return datetime.fromtimestamp(int(ms) / 1000, tz=timezone.utc).replace(tzinfo=None)
-
+    # int() först så att "1700000000000" och 1700000000000 delar cachepost
+    return _ms_to_naive_utc(int(ms))
+
+@lru_cache(maxsize=1024)
+def _ms_to_naive_utc(ms):
+    # Klienter skickar samma intervallgränser (t.ex. månadsskiften) om och om
+    # igen; datetime är immutabel så cachade värden kan delas.
+    return _EPOCH + timedelta(milliseconds=ms)
+
+# Giltigt intervall för datetime (år 1 till 9999) i epoch-ms
+_MIN_MS = -62135596800000
+_MAX_MS = 253402300799999
+
+def _parse_ms(value):
+    """Query-param -> int ms, eller None om värdet saknas/är ogiltigt (utan exceptions)."""
+    digits = value[1:] if value and value[0] == "-" else value
+    if not digits or not digits.isdecimal():
+        return None
+    ms = int(value)
+    return ms if _MIN_MS <= ms <= _MAX_MS else None
+
+@lru_cache(maxsize=1024)
 def naive_utc_to_ms(dt):
     """naive UTC datetime -> ms (epoch)"""
-    # Behandla dt som UTC
-    return int(dt.replace(tzinfo=timezone.utc).timestamp() * 1000)
+    # Ren heltalsaritmetik på differensen mot epoch: ingen timetuple/timegm
+    delta = dt - _EPOCH
+    return delta.days * 86_400_000 + delta.seconds * 1000 + delta.microseconds // 1000
 
 # --------------------- Event endpoints ---------------------
 
+_EVENT_BATCH_SIZE = 1000
+
+# Kolumnerna som get_events serialiserar, i den ordning raderna packas upp
+_EVENT_COLUMNS = (
+    CalendarEvent.id,
+    CalendarEvent.title,
+    CalendarEvent.start_time,
+    CalendarEvent.end_time,
+    CalendarEvent.notes,
+    CalendarEvent.color,
+)
+
+def _stream_events(result):
+    """Samma kuvert som success_response, men data-listan skrivs per batch."""
+    yield b'{"success":true,"data":['
+    try:
+        first = True
+        for batch in result.partitions():
+            chunk = b",".join(orjson.dumps({
+                'id': event_id,
+                'title': title,
+                'start': naive_utc_to_ms(start_time),
+                'end': naive_utc_to_ms(end_time),
+                'notes': notes,
+                'color': color
+            }) for event_id, title, start_time, end_time, notes, color in batch)
+            yield chunk if first else b"," + chunk
+            first = False
+    except Exception as e:
+        # Statusraden är redan skickad; logga och avbryt strömmen
+        logger.error(f"Error streaming events: {str(e)}")
+        raise
+    finally:
+        result.close()
+    yield b'],"error":null}'
+
 @calendar_api.route('/events', methods=['GET'])
 @token_required
 def get_events(current_user):
@@ -37,38 +91,31 @@ def get_events(current_user):
         start_ts = request.args.get('start')
         end_ts = request.args.get('end')
 
-        query = CalendarEvent.query.filter_by(user_id=current_user.id)
-
-        start_dt = end_dt = None
-        if start_ts:
-            try:
-                start_dt = ms_to_naive_utc(start_ts)
-                query = query.filter(CalendarEvent.start_time >= start_dt)
-            except Exception:
-                return error_response("Invalid start timestamp format", 400)
-
-        if end_ts:
-            try:
-                end_dt = ms_to_naive_utc(end_ts)
-                query = query.filter(CalendarEvent.end_time <= end_dt)
-            except Exception:
-                return error_response("Invalid end timestamp format", 400)
-
-        if start_dt and end_dt and end_dt < start_dt:
+        start_ms = _parse_ms(start_ts)
+        if start_ts and start_ms is None:
+            return error_response("Invalid start timestamp format", 400)
+        end_ms = _parse_ms(end_ts)
+        if end_ts and end_ms is None:
+            return error_response("Invalid end timestamp format", 400)
+        if start_ms is not None and end_ms is not None and end_ms < start_ms:
             return error_response("end must be >= start", 400)
 
-        events = query.order_by(CalendarEvent.start_time.asc()).all()
-
-        events_data = [{
-            'id': e.id,
-            'title': e.title,
-            'start': naive_utc_to_ms(e.start_time),
-            'end': naive_utc_to_ms(e.end_time),
-            'notes': e.notes,
-            'color': e.color
-        } for e in events]
-
-        return success_response(events_data)
+        # Core-select av bara de kolumner som serialiseras: inga ORM-instanser,
+        # identity map eller instance state per rad.
+        stmt = select(*_EVENT_COLUMNS).where(CalendarEvent.user_id == current_user.id)
+        if start_ms is not None:
+            stmt = stmt.where(CalendarEvent.start_time >= ms_to_naive_utc(start_ms))
+        if end_ms is not None:
+            stmt = stmt.where(CalendarEvent.end_time <= ms_to_naive_utc(end_ms))
+
+        # yield_per strömmar raderna i batchar (server-side cursor) och svaret
+        # skrivs batch för batch, så minnet begränsas till en batch i taget.
+        result = db.session.execute(
+            stmt.order_by(CalendarEvent.start_time.asc()).execution_options(yield_per=_EVENT_BATCH_SIZE)
+        )
+        return current_app.response_class(
+            stream_with_context(_stream_events(result)), mimetype="application/json"
+        ), 200
 
     except Exception as e:
         logger.error(f"Error in get_events: {str(e)}")
@@ -128,8 +175,8 @@ def update_event(current_user, event_id):
     """Update an existing event (accepts title, start, end in ms, notes, color)"""
     try:
         data = request.get_json(silent=True) or {}
-        event = CalendarEvent.query.filter_by(id=event_id, user_id=current_user.id).first()
-        if not event:
+        event = db.session.get(CalendarEvent, event_id)
+        if not event or event.user_id != current_user.id:
             return error_response("Event not found", 404)
 
         # Temporära värden för validering av start/end
@@ -184,14 +231,13 @@ def update_event(current_user, event_id):
 def delete_event(current_user, event_id):
     """Delete an event"""
     try:
-        event = CalendarEvent.query.filter_by(id=event_id, user_id=current_user.id).first()
-        if not event:
+        event = db.session.get(CalendarEvent, event_id)
+        if not event or event.user_id != current_user.id:
             return error_response("Event not found", 404)
 
         db.session.delete(event)
         db.session.commit()
-        return success_response({"message": "Event deleted successfully"})
-        # (Alternativt: return ("", 204))
+        return "", 204
 
     except Exception as e:
         logger.error(f"Error in delete_event: {str(e)}")
@@ -239,25 +285,38 @@ def save_day_note(current_user, date_str):
         if 'notes' not in data:
             return error_response("Missing required field: notes", 400)
 
-        note = DayNote.query.filter_by(date=day_date, user_id=current_user.id).first()
-        if note:
-            note.notes = data['notes']
-            note.updated_at = datetime.utcnow()
+        # INSERT ... ON DUPLICATE KEY UPDATE / ON CONFLICT i stället för SELECT +
+        # INSERT/UPDATE; undviker också racet där två samtidiga requests båda gör INSERT.
+        now = datetime.utcnow()
+        stmt = upsert(
+            DayNote,
+            {
+                "id": DayNote.generate_id(),
+                "date": day_date,
+                "notes": data['notes'],
+                "user_id": current_user.id,
+                "created_at": now,
+                "updated_at": now,
+            },
+            index_elements=["user_id", "date"],
+            update_columns=["notes", "updated_at"],
+        )
+        if db.session.get_bind().dialect.insert_returning:
+            # SQLite/Postgres: radens id (nytt eller befintligt) i samma sats
+            note_id = db.session.execute(stmt.returning(DayNote.id)).scalar_one()
         else:
-            note = DayNote(
-                id=DayNote.generate_id(),
-                date=day_date,
-                notes=data['notes'],
-                user_id=current_user.id
-            )
-            db.session.add(note)
-
+            # MySQL saknar RETURNING och LAST_INSERT_ID() bär bara heltal, medan
+            # id här är en sträng: det befintliga id:t kräver en egen SELECT
+            db.session.execute(stmt)
+            note_id = db.session.execute(
+                select(DayNote.id).filter_by(date=day_date, user_id=current_user.id)
+            ).scalar_one()
         db.session.commit()
 
         return success_response({
-            "id": note.id,
-            "date": note.date.isoformat(),
-            "notes": note.notes
+            "id": note_id,
+            "date": day_date.isoformat(),
+            "notes": data['notes']
         })
 
     except Exception as e:
@@ -1,11 +1,9 @@
 from flask import Blueprint, request
 from services.db_config import db
+from services.db_retry import retry_on_connection_error
 from models.command_center_models import CCNote, CCTodo, NoteTemplate
 from api.auth_routes import token_required
 from api.routes import success_response, error_response
-from sqlalchemy.exc import OperationalError
-from functools import wraps
-from time import sleep
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,22 +14,6 @@ VALID_TODO_TYPES = {'week', 'date'}
 VALID_TODO_STATUSES = {'open', 'done'}
 
 
-def retry_on_connection_error(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        for attempt in range(3):
-            try:
-                return func(*args, **kwargs)
-            except OperationalError as e:
-                logger.warning("DB OperationalError (attempt %s/3): %s", attempt + 1, e)
-                db.session.rollback()
-                if attempt < 2:
-                    sleep(0.5)
-                    continue
-                raise
-    return wrapper
-
-
 # ============================================================
 # TEMPLATES
 # ============================================================
@@ -46,7 +28,6 @@ def get_templates(current_user):
 
 @command_center_api.route("/templates", methods=["POST"])
 @token_required
-@retry_on_connection_error
 def create_template(current_user):
     data = request.get_json(silent=True) or {}
     name = (data.get("name") or "").strip()
@@ -65,7 +46,6 @@ def create_template(current_user):
 
 @command_center_api.route("/templates/<template_id>", methods=["PUT"])
 @token_required
-@retry_on_connection_error
 def update_template(current_user, template_id):
     template = NoteTemplate.query.filter_by(id=template_id, user_id=current_user.id).first()
     if not template:
@@ -84,7 +64,6 @@ def update_template(current_user, template_id):
 
 @command_center_api.route("/templates/<template_id>", methods=["DELETE"])
 @token_required
-@retry_on_connection_error
 def delete_template(current_user, template_id):
     template = NoteTemplate.query.filter_by(id=template_id, user_id=current_user.id).first()
     if not template:
@@ -118,7 +97,6 @@ def get_note(current_user, note_id):
 
 @command_center_api.route("/notes", methods=["POST"])
 @token_required
-@retry_on_connection_error
 def create_note(current_user):
     data = request.get_json(silent=True) or {}
     tags_input = data.get("tags")
@@ -141,7 +119,6 @@ def create_note(current_user):
 
 @command_center_api.route("/notes/<note_id>", methods=["PUT"])
 @token_required
-@retry_on_connection_error
 def update_note(current_user, note_id):
     note = CCNote.query.filter_by(id=note_id, user_id=current_user.id).first()
     if not note:
@@ -165,7 +142,6 @@ def update_note(current_user, note_id):
 
 @command_center_api.route("/notes/<note_id>", methods=["DELETE"])
 @token_required
-@retry_on_connection_error
 def delete_note(current_user, note_id):
     note = CCNote.query.filter_by(id=note_id, user_id=current_user.id).first()
     if not note:
@@ -201,7 +177,6 @@ def get_todos(current_user):
 
 @command_center_api.route("/todos", methods=["POST"])
 @token_required
-@retry_on_connection_error
 def create_todo(current_user):
     data = request.get_json(silent=True) or {}
     content = (data.get("content") or "").strip()
@@ -229,7 +204,6 @@ def create_todo(current_user):
 
 @command_center_api.route("/todos/<todo_id>", methods=["PUT"])
 @token_required
-@retry_on_connection_error
 def update_todo(current_user, todo_id):
     todo = CCTodo.query.filter_by(id=todo_id, user_id=current_user.id).first()
     if not todo:
@@ -258,7 +232,6 @@ def update_todo(current_user, todo_id):
 
 @command_center_api.route("/todos/<todo_id>", methods=["DELETE"])
 @token_required
-@retry_on_connection_error
 def delete_todo(current_user, todo_id):
     todo = CCTodo.query.filter_by(id=todo_id, user_id=current_user.id).first()
     if not todo:
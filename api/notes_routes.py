@@ -1,24 +1,16 @@
 # api/notes_routes.py
-from flask import Blueprint, jsonify, request
-from sqlalchemy import and_, or_
-from services.db_config import db, DriveFile, NoteContent
-from api.auth_routes import token_required
+from flask import Blueprint, request
+from sqlalchemy import and_, delete, func, literal, or_, select, update
+from services.db_config import db, upsert, DriveFile, NoteContent
+from api.auth_routes import token_required, success_response, error_response
 import logging
 from datetime import datetime
-import os
 import uuid
 
 logger = logging.getLogger(__name__)
 notes = Blueprint('notes', __name__)
 
 
-def success_response(data=None, status_code=200):
-    return jsonify({"success": True, "data": data if data is not None else {}, "error": None}), status_code
-
-
-def error_response(message, status_code=400, data=None):
-    return jsonify({"success": False, "data": data, "error": message}), status_code
-
 # --- Hjälpare ---
 def _norm_path(p: str) -> str:
     """Normalisera sökväg: ledande '/', ingen trailing '/' (utom för root)."""
@@ -30,6 +22,17 @@ def _norm_path(p: str) -> str:
     p = p.rstrip("/")
     return "/" if p == "" else p
 
+def _split_path(p: str):
+    """Normaliserad DB-sökväg -> (parent, namn). Alltid '/' som separator, oberoende av OS."""
+    head, _, tail = p.rpartition("/")
+    return (head or "/", tail)
+
+def _parent_of(p: str):
+    """Föräldrakatalog för en normaliserad sökväg (None för själva roten)."""
+    if p == "/":
+        return None
+    return _split_path(p)[0]
+
 def _now_utc():
     return datetime.utcnow()
 
@@ -37,12 +40,26 @@ def _normalize_tags(tags):
     """Tillåt både lista och sträng; lagra som kommaseparerad sträng."""
     if tags is None:
         return ""
+    if isinstance(tags, str):
+        return tags.strip()
     if isinstance(tags, list):
-        return ",".join([str(t).strip() for t in tags if str(t).strip()])
+        # str()/strip() en gång per element
+        return ",".join([s for t in tags if (s := str(t).strip())])
     return str(tags).strip()
 
 # --------------------- List files ---------------------
 
+# Kolumnerna som list_files serialiserar, i den ordning raderna packas upp
+_FILE_LIST_COLUMNS = (
+    DriveFile.id,
+    DriveFile.name,
+    DriveFile.file_path,
+    DriveFile.is_folder,
+    DriveFile.tags,
+    DriveFile.url,
+    DriveFile.created_time,
+)
+
 @notes.route('/files', methods=['GET'])
 @token_required
 def list_files(current_user):
@@ -52,41 +69,22 @@ def list_files(current_user):
         logger.info(f"Listing files at path: {path}")
 
         try:
-            if path == '/':
-                # Root: antingen exakt '/', eller direkt under root ("/name", men inte "/a/b")
-                files = DriveFile.query.filter(
-                    and_(
-                        DriveFile.user_id == current_user.id,
-                        or_(
-                            DriveFile.file_path == '/',
-                            and_(DriveFile.file_path.like('/%'), ~DriveFile.file_path.like('/%/%'))
-                        )
-                    )
-                ).order_by(DriveFile.is_folder.desc(), DriveFile.name.asc()).all()
-            else:
-                # Annan katalog: antingen exakt katalogen själv eller poster direkt i den
-                files = DriveFile.query.filter(
-                    and_(
-                        DriveFile.user_id == current_user.id,
-                        or_(
-                            DriveFile.file_path == path,
-                            and_(DriveFile.file_path.like(f"{path}/%"), ~DriveFile.file_path.like(f"{path}/%/%"))
-                        )
-                    )
-                ).order_by(DriveFile.is_folder.desc(), DriveFile.name.asc()).all()
-
-            # Filtrera bort katalogen själv från resultatet
-            filtered = [f for f in files if not (f.is_folder and f.file_path == path)]
+            # Core-select av bara de kolumner som listan visar (hoppar över ORM-hydrering);
+            # direkta barn är en likhetsfråga på (user_id, parent_path)
+            stmt = select(*_FILE_LIST_COLUMNS).where(DriveFile.user_id == current_user.id, DriveFile.parent_path == path)
+            rows = db.session.execute(
+                stmt.order_by(DriveFile.is_folder.desc(), DriveFile.name.asc())
+            ).all()
 
             response_data = [{
-                'id': f.id,
-                'name': f.name,
-                'file_path': f.file_path,
-                'is_folder': f.is_folder,
-                'tags': f.tags.split(',') if f.tags else [],
-                'url': f.url,
-                'created_time': f.created_time.isoformat() if f.created_time else None
-            } for f in filtered]
+                'id': file_id,
+                'name': name,
+                'file_path': file_path,
+                'is_folder': is_folder,
+                'tags': tags.split(',') if tags else [],
+                'url': url,
+                'created_time': created_time.isoformat() if created_time else None
+            } for file_id, name, file_path, is_folder, tags, url, created_time in rows]
 
             return success_response(response_data)
 
@@ -111,8 +109,7 @@ def create_directory(current_user):
             return error_response("Path is required", 400)
 
         path = _norm_path(data['path'])
-        dir_name = os.path.basename(path)
-        parent_path = os.path.dirname(path) or "/"
+        parent_path, dir_name = _split_path(path)
 
         logger.info(f"Creating directory: {dir_name} at {parent_path}")
 
@@ -135,6 +132,7 @@ def create_directory(current_user):
             id=str(uuid.uuid4()),
             name=dir_name,
             file_path=path,
+            parent_path=_parent_of(path),
             is_folder=True,
             created_time=_now_utc(),
             user_id=current_user.id
@@ -170,8 +168,7 @@ def save_note(current_user):
         tags = _normalize_tags(data.get('tags', ''))
         description = (data.get('description') or "").strip()
 
-        file_name = os.path.basename(path)
-        parent_path = os.path.dirname(path) or "/"
+        parent_path, file_name = _split_path(path)
 
         logger.info(f"Saving note: {file_name} at {parent_path}")
 
@@ -192,18 +189,20 @@ def save_note(current_user):
             existing_file.tags = tags
             existing_file.notebooklm = description  # använder fältet notebooklm som beskrivning
 
-            note_content = NoteContent.query.filter_by(file_id=existing_file.id).first()
-            if note_content:
-                note_content.content = content
-                note_content.updated_time = _now_utc()
-            else:
-                note_content = NoteContent(
-                    id=str(uuid.uuid4()),
-                    file_id=existing_file.id,
-                    content=content,
-                    updated_time=_now_utc()
-                )
-                db.session.add(note_content)
+            # En upsert på unika file_id i stället för SELECT + UPDATE/INSERT
+            now = _now_utc()
+            db.session.execute(upsert(
+                NoteContent,
+                {
+                    "id": str(uuid.uuid4()),
+                    "file_id": existing_file.id,
+                    "content": content,
+                    "created_time": now,
+                    "updated_time": now,
+                },
+                index_elements=["file_id"],
+                update_columns=["content", "updated_time"],
+            ))
 
             db.session.commit()
             file_id = existing_file.id
@@ -213,6 +212,7 @@ def save_note(current_user):
                 id=str(uuid.uuid4()),
                 name=file_name,
                 file_path=path,
+                parent_path=_parent_of(path),
                 is_folder=False,
                 tags=tags,
                 notebooklm=description,
@@ -254,30 +254,40 @@ def get_note(current_user):
 
         logger.info(f"Getting note content from: {path}")
 
-        note_file = DriveFile.query.filter_by(
-            file_path=path, is_folder=False, user_id=current_user.id
+        # Fil och innehåll i en och samma fråga (outer join: innehåll kan saknas)
+        row = db.session.execute(
+            select(DriveFile.id, DriveFile.tags, DriveFile.notebooklm, NoteContent.content)
+            .outerjoin(NoteContent, NoteContent.file_id == DriveFile.id)
+            .where(
+                DriveFile.file_path == path,
+                DriveFile.is_folder.is_(False),
+                DriveFile.user_id == current_user.id,
+            )
+            .limit(1)
         ).first()
-        if not note_file:
+        if not row:
             return error_response(f"Note not found: {path}", 404)
-
-        note_content = NoteContent.query.filter_by(file_id=note_file.id).first()
-        if not note_content:
-            # Skapa tomt innehåll vid behov
-            note_content = NoteContent(
-                id=str(uuid.uuid4()),
-                file_id=note_file.id,
-                content="",
-                updated_time=_now_utc()
-            )
-            db.session.add(note_content)
+        file_id, file_tags, file_description, content = row
+
+        if content is None:
+            # Skapa tomt innehåll vid behov; no-op-uppdatering om en annan
+            # request hann före (unikt file_id)
+            now = _now_utc()
+            db.session.execute(upsert(
+                NoteContent,
+                {"id": str(uuid.uuid4()), "file_id": file_id, "content": "", "created_time": now, "updated_time": now},
+                index_elements=["file_id"],
+                update_columns=["file_id"],
+            ))
             db.session.commit()
+            content = ""
 
-        tags = note_file.tags.split(',') if note_file.tags else []
-        description = note_file.notebooklm or ""
+        tags = file_tags.split(',') if file_tags else []
+        description = file_description or ""
 
         return success_response({
-            "id": note_file.id,
-            "content": note_content.content,
+            "id": file_id,
+            "content": content,
             "tags": tags,
             "description": description
         })
@@ -303,26 +313,26 @@ def delete_file(current_user):
         if not file_item:
             return error_response(f"Item not found: {path}", 404)
 
-        # Om katalog: radera alla barn först
+        # Hela delträdet raderas med två set-baserade satser (innehåll, sedan
+        # filer) oavsett antal barn, i stället för SELECT + DELETE per rad.
+        subtree = DriveFile.id == file_item.id
         if file_item.is_folder:
-            children = DriveFile.query.filter(
-                and_(DriveFile.file_path.like(f"{path}/%"), DriveFile.user_id == current_user.id)
-            ).all()
-            for child in children:
-                nc = NoteContent.query.filter_by(file_id=child.id).first()
-                if nc:
-                    db.session.delete(nc)
-                db.session.delete(child)
-
-        # Radera ev. NoteContent för det primära objektet
-        nc = NoteContent.query.filter_by(file_id=file_item.id).first()
-        if nc:
-            db.session.delete(nc)
-
-        db.session.delete(file_item)
+            subtree = or_(subtree, DriveFile.file_path.like(f"{path}/%"))
+        subtree = and_(DriveFile.user_id == current_user.id, subtree)
+
+        db.session.execute(
+            delete(NoteContent).where(
+                NoteContent.file_id.in_(select(DriveFile.id).where(subtree).scalar_subquery())
+            ),
+            execution_options={"synchronize_session": False},
+        )
+        db.session.execute(
+            delete(DriveFile).where(subtree),
+            execution_options={"synchronize_session": False},
+        )
         db.session.commit()
 
-        return success_response({"message": f"Successfully deleted: {path}"})
+        return "", 204
     except Exception as e:
         logger.error(f"Error in delete_file: {str(e)}")
         db.session.rollback()
@@ -353,36 +363,58 @@ def move_file(current_user):
 
         logger.info(f"Moving from {source_path} to {destination_path}")
 
-        source_file = DriveFile.query.filter_by(
-            file_path=source_path, user_id=current_user.id
-        ).first()
+        # Källa, destinationens parent och destinationen slås upp i en fråga
+        parent_path = _split_path(destination_path)[0]
+        rows = db.session.execute(
+            select(DriveFile.file_path, DriveFile.id, DriveFile.is_folder).where(
+                DriveFile.user_id == current_user.id,
+                DriveFile.file_path.in_({source_path, parent_path, destination_path}),
+            )
+        ).all()
+        # Sökvägar är inte unika i schemat; behåll den första träffen per path
+        # (motsvarar tidigare .first())
+        by_path = {}
+        for file_path, file_id, is_folder in rows:
+            by_path.setdefault(file_path, (file_id, is_folder))
+
+        source_file = by_path.get(source_path)
         if not source_file:
             return error_response(f"Source path not found: {source_path}", 404)
+        source_id, source_is_folder = source_file
 
         # Validera att destinationens parent finns (om inte root)
-        parent_path = os.path.dirname(destination_path) or "/"
         if parent_path != "/":
-            parent_dir = DriveFile.query.filter_by(
-                file_path=parent_path, is_folder=True, user_id=current_user.id
-            ).first()
-            if not parent_dir:
+            if not any(file_path == parent_path and is_folder for file_path, _, is_folder in rows):
                 return error_response(f"Destination directory does not exist: {parent_path}", 400)
 
         # Destination får inte redan finnas
-        if DriveFile.query.filter_by(file_path=destination_path, user_id=current_user.id).first():
+        if destination_path in by_path:
             return error_response(f"Destination already exists: {destination_path}", 400)
 
-        if source_file.is_folder:
-            # Flytta alla barn
-            children = DriveFile.query.filter(
-                and_(DriveFile.file_path.like(f"{source_path}/%"), DriveFile.user_id == current_user.id)
-            ).all()
-            logger.info(f"Found {len(children)} children to move")
-            for child in children:
-                child.file_path = child.file_path.replace(source_path, destination_path, 1)
+        if source_is_folder:
+            # Flytta alla barn i en UPDATE: byt prefixet source_path -> destination_path
+            # (+ renderas som concat() i MySQL och || i SQLite/Postgres)
+            result = db.session.execute(
+                update(DriveFile)
+                .where(
+                    DriveFile.file_path.like(f"{source_path}/%"),
+                    DriveFile.user_id == current_user.id,
+                )
+                .values(
+                    file_path=literal(destination_path) + func.substr(DriveFile.file_path, len(source_path) + 1),
+                    parent_path=literal(destination_path) + func.substr(DriveFile.parent_path, len(source_path) + 1),
+                ),
+                execution_options={"synchronize_session": False},
+            )
+            logger.info(f"Moved {result.rowcount} children")
 
         # Flytta själva noden
-        source_file.file_path = destination_path
+        db.session.execute(
+            update(DriveFile)
+            .where(DriveFile.id == source_id)
+            .values(file_path=destination_path, parent_path=_parent_of(destination_path)),
+            execution_options={"synchronize_session": False},
+        )
         db.session.commit()
 
         return success_response({"message": f"Successfully moved {source_path} to {destination_path}", "new_path": destination_path})
@@ -1,14 +1,15 @@
 from datetime import datetime
-from flask import Blueprint, request
-from services.db_config import db
+from flask import Blueprint, current_app, request, stream_with_context
+from services.db_config import db, upsert
+from services.db_retry import retry_on_connection_error
+from services.ids import uuid4_batch
+from services.ttl_cache import TTLCache
 from models.planner_models import PlannerActivity, PlannerCourse
-from api.auth_routes import token_required
-from api.routes import success_response, error_response
-from sqlalchemy.exc import OperationalError, IntegrityError
-from functools import wraps
-from time import sleep
-import uuid
-import re
+from api.auth_routes import token_required, success_response, error_response
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import raiseload
+from operator import itemgetter
+import orjson
 import logging
 
 # Configure logger
@@ -16,45 +17,165 @@ logger = logging.getLogger(__name__)
 
 planner_api = Blueprint("planner_api", __name__)
 
-# Regex for HH:MM format (00:00 to 23:59)
-TIME_FORMAT_REGEX = re.compile(r'^([01]\d|2[0-3]):([0-5]\d)$')
-
-# Allow-list for inbound activity fields
-ALLOWED_ACTIVITY_INBOUND_FIELDS = {
-    "id",
-    "title",
-    "teacher",
-    "room",
-    "notes",
-    "day",
-    "startTime",
-    "endTime",
-    "color",
-    "category",
-    "duration",
-}
+# Alla giltiga HH:MM (00:00 till 23:59) -> minuter sedan midnatt. En dict-
+# uppslagning validerar och parsar på en gång: ingen regex, split eller int().
+_HHMM_MINUTES = {f"{h:02d}:{m:02d}": h * 60 + m for h in range(24) for m in range(60)}
+
+# Antal rader per batch när aktivitetslistan strömmas (yield_per)
+_ACTIVITY_BATCH_SIZE = 500
+
+# Arkivlistan per användare; töms av alla skrivningar mot planner_activity
+_ARCHIVES_CACHE = TTLCache(maxsize=4096, ttl=30)
 
 # --- Helpers ---
 
-def retry_on_connection_error(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        for attempt in range(3):
-            try:
-                return func(*args, **kwargs)
-            except OperationalError as e:
-                logger.warning("DB OperationalError (attempt %s/3): %s", attempt + 1, e)
-                db.session.rollback()
-                if attempt < 2:
-                    sleep(0.5)
-                    continue
-                raise
-    return wrapper
-
-def _calculate_duration_minutes(start_time: str, end_time: str) -> int:
-    sh, sm = map(int, start_time.split(':'))
-    eh, em = map(int, end_time.split(':'))
-    return (eh * 60 + em) - (sh * 60 + sm)
+def _parse_json_body():
+    """orjson-parsning av request-kroppen; None vid tom/ogiltig JSON (som get_json(silent=True))."""
+    body = request.get_data(cache=False)
+    if not body:
+        return None
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return None
+
+def _activity_row(item, user_id, archive_name, keep_id, next_id,
+                  _minutes=_HHMM_MINUTES.get, _str=str, _dict=dict):
+    """Validera en inkommande aktivitet och bygg insert-raden i ett svep.
+
+    Bara kända fält läses (ingen mellanliggande filtrerad kopia av dicten).
+    De understreckade standardargumenten binder globaler/builtins som lokala
+    namn (LOAD_FAST) eftersom funktionen körs en gång per inkommande rad.
+    """
+    if type(item) is not _dict:  # orjson ger alltid exakt dict
+        raise ValueError("Each activity must be an object")
+    get = item.get
+    title, day = get("title"), get("day")
+    start_time, end_time = get("startTime"), get("endTime")
+
+    if not (title and day and start_time and end_time):
+        raise ValueError("Required fields missing")
+    # type() is str: en pekarjämförelse per fält i stället för isinstance-anrop
+    if not (type(title) is _str and type(day) is _str
+            and type(start_time) is _str and type(end_time) is _str):
+        raise ValueError("Invalid field type")
+    start_min, end_min = _minutes(start_time), _minutes(end_time)
+    if start_min is None or end_min is None:
+        raise ValueError("Invalid time format")
+
+    # .strip() allokerar inget när strängen redan saknar kantblanksteg (CPython
+    # returnerar samma objekt), så ingen egen "snabb strip" behövs här.
+    return {
+        # next_id delar ut förgenererade UUID:n (se services.ids.uuid4_batch)
+        "id": (get("id") if keep_id else None) or next_id(),
+        "user_id": user_id,
+        "title": title.strip(),
+        "teacher": get("teacher") or "",
+        "room": get("room") or "",
+        "notes": get("notes") or "",
+        "day": day.strip(),
+        "start_time": start_time,
+        "end_time": end_time,
+        "color": get("color"),
+        "category": get("category"),
+        "duration": end_min - start_min,
+        "archive_name": archive_name,
+        "deleted_at": None,
+    }
+
+def _course_row(item, user_id, next_id, _str=str, _dict=dict):
+    """Validera en inkommande kurs och bygg insert-raden i ett svep (lokala
+    bindningar som i _activity_row)."""
+    if type(item) is not _dict:  # orjson ger alltid exakt dict
+        raise ValueError("Each course must be an object")
+    get = item.get
+    title = get("title")
+    if not title:
+        raise ValueError("Title required")
+    if type(title) is not _str:
+        raise ValueError("Invalid field type")
+    course_id = get("id")
+    if type(course_id) is _str:
+        course_id = course_id.strip()
+    elif course_id is not None:
+        raise ValueError("Invalid course id")
+    return {
+        # Courses already respected client-supplied IDs
+        "id": course_id or next_id(),
+        "user_id": user_id,
+        "title": title.strip(),
+        "teacher": get("teacher"),
+        "room": get("room"),
+        "duration": _coerce_positive_int("duration", get("duration"), 60),
+        "color": get("color"),
+        "category": get("category"),
+    }
+
+def _upsert_in_pages(model, rows, index_elements, update_columns):
+    """upsert() blir en enda flerrads-VALUES; dela upp i sidor om
+    insertmanyvalues_page_size rader så stora synkar håller sig under
+    max_allowed_packet (och SQLites gräns för bindparametrar)."""
+    page = db.session.get_bind().dialect.insertmanyvalues_page_size
+    for start in range(0, len(rows), page):
+        db.session.execute(upsert(model, rows[start:start + page], index_elements, update_columns))
+
+# Kolumner som skrivs om när en befintlig aktivitet upsertas. user_id skrivs
+# aldrig om: en upsert får inte kunna flytta en rad till en annan användare.
+_ACTIVITY_UPSERT_COLUMNS = [c.name for c in PlannerActivity.__table__.c if c.name not in ("id", "user_id")]
+
+_COURSE_UPSERT_COLUMNS = [c.name for c in PlannerCourse.__table__.c if c.name not in ("id", "user_id")]
+
+def _reject_duplicate_ids(rows, label):
+    # Dubbletter i samma payload skulle tyst slås ihop av upserten (MySQL)
+    # medan svaret ändå räknar och returnerar dem
+    seen = set()
+    for row in rows:
+        if row["id"] in seen:
+            raise ValueError(f"Duplicate {label} id: {row['id']}")
+        seen.add(row["id"])
+
+def _sync_current_activities(user_id, rows):
+    """Diff-synk av nuvarande schema: upserta inkommande rader och soft-delete:a
+    de aktiva rader som inte längre finns med, i stället för att skriva om allt.
+
+    Oförändrade rader ger ingen faktisk skrivning i MySQL (ON DUPLICATE KEY
+    UPDATE med samma värden).
+    """
+    incoming_ids = [r["id"] for r in rows]
+    if incoming_ids:
+        # Upserten får bara träffa egna rader i nuvarande schema. Egna
+        # soft-deletade rader i arkiv ger plats (hard-delete); allt annat är
+        # en ID-krock som inte får skrivas över.
+        # Ingen FOR UPDATE: under REPEATABLE READ skulle den ta gap-lås för
+        # varje id som saknas, och två samtidiga synkar med nya id:n i samma
+        # lucka deadlockar på sina INSERT. Att upserten aldrig skriver om
+        # user_id (se _ACTIVITY_UPSERT_COLUMNS) räcker för att en rad inte
+        # ska kunna byta ägare.
+        clashes = db.session.execute(
+            select(PlannerActivity.id, PlannerActivity.user_id, PlannerActivity.archive_name, PlannerActivity.deleted_at)
+            .where(PlannerActivity.id.in_(incoming_ids))
+        ).all()
+        stale_ids = []
+        for activity_id, owner_id, row_archive, deleted_at in clashes:
+            if owner_id == user_id and row_archive is None:
+                continue
+            if owner_id == user_id and deleted_at is not None:
+                stale_ids.append(activity_id)
+                continue
+            raise ValueError(f"Activity id already in use: {activity_id}")
+        if stale_ids:
+            db.session.execute(delete(PlannerActivity).where(PlannerActivity.id.in_(stale_ids)))
+
+        _upsert_in_pages(PlannerActivity, rows, ["id"], _ACTIVITY_UPSERT_COLUMNS)
+
+    missing = update(PlannerActivity).where(
+        PlannerActivity.user_id == user_id,
+        PlannerActivity.archive_name.is_(None),
+        PlannerActivity.deleted_at.is_(None),
+    )
+    if incoming_ids:
+        missing = missing.where(PlannerActivity.id.notin_(incoming_ids))
+    db.session.execute(missing.values(deleted_at=datetime.utcnow()))
 
 def _coerce_positive_int(name: str, value, default: int):
     if value is None:
@@ -67,33 +188,67 @@ def _coerce_positive_int(name: str, value, default: int):
         raise ValueError(f"{name} must be a positive integer")
     return iv
 
-def _serialize_activity(activity: PlannerActivity):
-    return {
-        "id": activity.id,
-        "userId": activity.user_id,
-        "title": activity.title,
-        "teacher": activity.teacher,
-        "room": activity.room,
-        "notes": activity.notes,
-        "day": activity.day,
-        "startTime": activity.start_time,
-        "endTime": activity.end_time,
-        "color": activity.color,
-        "category": activity.category,
-        "duration": activity.duration,
-        "archiveName": activity.archive_name,
-    }
+# Kolumnordning för Core-select och motsvarande JSON-nycklar; serialisering
+# blir dict(zip(...)) över radtupeln i stället för ett attribut-/nyckeluppslag per fält.
+_ACTIVITY_COLUMNS = (
+    PlannerActivity.id,
+    PlannerActivity.user_id,
+    PlannerActivity.title,
+    PlannerActivity.teacher,
+    PlannerActivity.room,
+    PlannerActivity.notes,
+    PlannerActivity.day,
+    PlannerActivity.start_time,
+    PlannerActivity.end_time,
+    PlannerActivity.color,
+    PlannerActivity.category,
+    PlannerActivity.duration,
+    PlannerActivity.archive_name,
+)
+_ACTIVITY_JSON_KEYS = (
+    "id", "userId", "title", "teacher", "room", "notes", "day",
+    "startTime", "endTime", "color", "category", "duration", "archiveName",
+)
+# Plockar ut värdena i kolumnordning ur en rad-dict (kolumnnamn -> värde)
+_activity_values = itemgetter(*(col.key for col in _ACTIVITY_COLUMNS))
 
-def _serialize_course(course: PlannerCourse):
-    return {
-        "id": course.id,
-        "title": course.title,
-        "teacher": course.teacher or "",
-        "room": course.room or "",
-        "duration": course.duration,
-        "color": course.color,
-        "category": course.category,
-    }
+def _serialize_activity(values):
+    """values: radtupel i _ACTIVITY_COLUMNS-ordning."""
+    return dict(zip(_ACTIVITY_JSON_KEYS, values))
+
+# teacher/room har alltid serialiserats som "" i stället för null; coalesce i
+# SELECT:en gör att raden kan zippas rakt in i en dict som aktiviteterna.
+_COURSE_COLUMNS = (
+    PlannerCourse.id,
+    PlannerCourse.title,
+    func.coalesce(PlannerCourse.teacher, "").label("teacher"),
+    func.coalesce(PlannerCourse.room, "").label("room"),
+    PlannerCourse.duration,
+    PlannerCourse.color,
+    PlannerCourse.category,
+)
+_COURSE_JSON_KEYS = ("id", "title", "teacher", "room", "duration", "color", "category")
+
+def _serialize_course(values):
+    """values: radtupel i _COURSE_COLUMNS-ordning."""
+    return dict(zip(_COURSE_JSON_KEYS, values))
+
+def _stream_activities(result):
+    """Samma kuvert som success_response, men data-listan skrivs per batch."""
+    yield b'{"success":true,"data":['
+    try:
+        first = True
+        for batch in result.partitions():
+            chunk = b",".join(orjson.dumps(_serialize_activity(row)) for row in batch)
+            yield chunk if first else b"," + chunk
+            first = False
+    except Exception as e:
+        # Statusraden är redan skickad; logga och avbryt strömmen
+        logger.error("Error streaming planner activities: %s", e)
+        raise
+    finally:
+        result.close()
+    yield b'],"error":null}'
 
 # --- Activity Routes ---
 
@@ -102,30 +257,47 @@ def _serialize_course(course: PlannerCourse):
 @retry_on_connection_error
 def get_planner_activities(current_user):
     archive_name = request.args.get("archive_name")
+    # Core-rader serialiseras direkt utan att ORM-objekt byggs upp.
+    stmt = select(*_ACTIVITY_COLUMNS).where(
+        PlannerActivity.user_id == current_user.id, PlannerActivity.deleted_at.is_(None)
+    )
     if archive_name is None:
-        activities = PlannerActivity.query.filter_by(user_id=current_user.id, archive_name=None).filter(PlannerActivity.deleted_at.is_(None)).all()
+        stmt = stmt.where(PlannerActivity.archive_name.is_(None))
     else:
-        activities = PlannerActivity.query.filter_by(user_id=current_user.id, archive_name=archive_name).filter(PlannerActivity.deleted_at.is_(None)).all()
-    return success_response([_serialize_activity(activity) for activity in activities])
+        stmt = stmt.where(PlannerActivity.archive_name == archive_name)
+    # yield_per strömmar raderna i batchar (server-side cursor), så stora arkiv
+    # aldrig ligger i minnet som en hel lista av dicts.
+    result = db.session.execute(stmt.execution_options(yield_per=_ACTIVITY_BATCH_SIZE))
+    return current_app.response_class(
+        stream_with_context(_stream_activities(result)), mimetype="application/json"
+    ), 200
 
 @planner_api.route("/archives", methods=["GET"])
 @token_required
 @retry_on_connection_error
 def get_planner_archives(current_user):
-    archive_rows = (
-        db.session.query(PlannerActivity.archive_name)
-        .filter(PlannerActivity.user_id == current_user.id, PlannerActivity.archive_name.isnot(None), PlannerActivity.deleted_at.is_(None))
-        .distinct().all()
-    )
-    archives = [row.archive_name for row in archive_rows]
+    archives = _ARCHIVES_CACHE.get(current_user.id)
+    if archives is None:
+        # ix_planner_activity_active (user_id, archive_name, deleted_at) täcker
+        # frågan helt: ett index-only intervall per användare, redan sorterat på
+        # archive_name, så GROUP BY behöver varken tabellrader eller filesort.
+        archives = db.session.execute(
+            select(PlannerActivity.archive_name)
+            .where(
+                PlannerActivity.user_id == current_user.id,
+                PlannerActivity.archive_name.isnot(None),
+                PlannerActivity.deleted_at.is_(None),
+            )
+            .group_by(PlannerActivity.archive_name)
+        ).scalars().all()
+        _ARCHIVES_CACHE.set(current_user.id, archives)
     return success_response(archives)
 
 @planner_api.route("/activities", methods=["POST"])
 @planner_api.route("/activities/sync", methods=["POST"])
 @token_required
-@retry_on_connection_error
 def sync_planner_activities(current_user):
-    payload = request.get_json(silent=True)
+    payload = _parse_json_body()
     archive_name = None
     activities_payload = payload
     if isinstance(payload, dict):
@@ -139,56 +311,43 @@ def sync_planner_activities(current_user):
         return error_response("Cannot save an empty archive — use DELETE to remove it", 400)
 
     try:
-        new_activities = []
+        # Respect client IDs for current schedule to prevent ID churn and preserve Undo stack.
+        # Archive saves always get new IDs to avoid PK collision with current-schedule entries.
+        # Loopinvarianter som lokala namn: current_user.id är en attributläsning
+        # på ORM-objektet och ska inte göras om per rad.
+        user_id, keep_id, make_row = current_user.id, not archive_name, _activity_row
+        next_id = iter(uuid4_batch(len(activities_payload))).__next__
+        # Ett svep bygger både insert-raden och API-formen för svaret, så listan
+        # inte behöver itereras en gång till efter commit.
+        new_activities, serialized = [], []
+        append_row, append_out = new_activities.append, serialized.append
         for item in activities_payload:
-            # Respect client IDs for current schedule to prevent ID churn and preserve Undo stack.
-            # Archive saves always get new IDs to avoid PK collision with current-schedule entries.
-            if archive_name:
-                activity_id = str(uuid.uuid4())
-            else:
-                activity_id = item.get("id") or str(uuid.uuid4())
-
-            item = {k: v for k, v in item.items() if k in ALLOWED_ACTIVITY_INBOUND_FIELDS}
-            title, day = item.get("title"), item.get("day")
-            start_time, end_time = item.get("startTime"), item.get("endTime")
-
-            if not title or not day or not start_time or not end_time:
-                raise ValueError("Required fields missing")
-            if not TIME_FORMAT_REGEX.match(start_time) or not TIME_FORMAT_REGEX.match(end_time):
-                raise ValueError("Invalid time format")
-
-            duration = _calculate_duration_minutes(start_time, end_time)
-            new_activities.append(PlannerActivity(
-                id=activity_id,
-                user_id=current_user.id,
-                title=title.strip(),
-                teacher=item.get("teacher") or "",
-                room=item.get("room") or "",
-                notes=item.get("notes") or "",
-                day=day.strip(),
-                start_time=start_time,
-                end_time=end_time,
-                color=item.get("color"),
-                category=item.get("category"),
-                duration=duration,
-                archive_name=archive_name
-            ))
-
-        filter_args = {"user_id": current_user.id, "archive_name": archive_name}
-        # Soft-delete existing active rows
-        PlannerActivity.query.filter_by(**filter_args).filter(
-            PlannerActivity.deleted_at.is_(None)
-        ).update({"deleted_at": datetime.utcnow()}, synchronize_session=False)
-        # Hard-delete any soft-deleted rows whose IDs collide with incoming payload
-        incoming_ids = [a.id for a in new_activities]
-        if incoming_ids:
-            PlannerActivity.query.filter(
-                PlannerActivity.id.in_(incoming_ids),
-                PlannerActivity.deleted_at.isnot(None)
-            ).delete(synchronize_session=False)
-        db.session.add_all(new_activities)
+            new_row = make_row(item, user_id, archive_name, keep_id, next_id)
+            append_row(new_row)
+            append_out(_serialize_activity(_activity_values(new_row)))
+
+        if archive_name:
+            # Arkiv får alltid nya ID:n: ersätt hela arkivet (soft-delete + INSERT).
+            # Båda är Core-statements på sessionens anslutning och transaktion:
+            # inget ORM-query-lager, ingen flush, en commit.
+            db.session.execute(
+                update(PlannerActivity)
+                .where(
+                    PlannerActivity.user_id == user_id,
+                    PlannerActivity.archive_name == archive_name,
+                    PlannerActivity.deleted_at.is_(None),
+                )
+                .values(deleted_at=datetime.utcnow())
+            )
+            # En flerrads-INSERT (executemany/insertmanyvalues, chunkad enligt
+            # insertmanyvalues_page_size) i stället för ORM-objekt rad för rad
+            db.session.execute(PlannerActivity.__table__.insert(), new_activities)
+        else:
+            _reject_duplicate_ids(new_activities, "activity")
+            _sync_current_activities(user_id, new_activities)
         db.session.commit()
-        return success_response({"count": len(new_activities), "activities": [_serialize_activity(a) for a in new_activities]}, 201)
+        _ARCHIVES_CACHE.pop(user_id)
+        return success_response({"count": len(new_activities), "activities": serialized}, 201)
     except Exception as e:
         logger.error("Error syncing planner activities: %s", e, exc_info=True)
         db.session.rollback()
@@ -196,27 +355,27 @@ def sync_planner_activities(current_user):
 
 @planner_api.route("/activities", methods=["DELETE"])
 @token_required
-@retry_on_connection_error
 def delete_planner_activities(current_user):
     archive_name = request.args.get("archive_name")
     PlannerActivity.query.filter_by(user_id=current_user.id, archive_name=archive_name).filter(
         PlannerActivity.deleted_at.is_(None)
     ).update({"deleted_at": datetime.utcnow()}, synchronize_session=False)
     db.session.commit()
-    return success_response({"message": "Deleted"})
+    _ARCHIVES_CACHE.pop(current_user.id)
+    return "", 204
 
 @planner_api.route("/<activity_id>", methods=["DELETE"])
 @token_required
-@retry_on_connection_error
 def delete_planner_activity(current_user, activity_id):
-    activity = PlannerActivity.query.filter_by(id=activity_id, user_id=current_user.id).filter(
+    activity = PlannerActivity.query.options(raiseload("*")).filter_by(id=activity_id, user_id=current_user.id).filter(
         PlannerActivity.deleted_at.is_(None)
     ).first()
     if not activity:
         return error_response("Activity not found", 404)
     activity.deleted_at = datetime.utcnow()
     db.session.commit()
-    return success_response({"message": "Deleted"})
+    _ARCHIVES_CACHE.pop(current_user.id)
+    return "", 204
 
 # --- Course Routes ---
 
@@ -224,35 +383,34 @@ def delete_planner_activity(current_user, activity_id):
 @token_required
 @retry_on_connection_error
 def get_planner_courses(current_user):
-    courses = PlannerCourse.query.filter_by(user_id=current_user.id).all()
+    courses = db.session.execute(
+        select(*_COURSE_COLUMNS).where(PlannerCourse.user_id == current_user.id)
+    ).all()
     return success_response([_serialize_course(c) for c in courses])
 
 @planner_api.route("/courses/sync", methods=["POST"])
 @token_required
-@retry_on_connection_error
 def sync_planner_courses(current_user):
-    payload = request.get_json(silent=True)
+    payload = _parse_json_body()
     courses_payload = payload.get("courses") if isinstance(payload, dict) else payload
     if not isinstance(courses_payload, list):
         return error_response("Invalid payload", 400)
 
     try:
-        new_courses = []
-        for item in courses_payload:
-            title = item.get("title")
-            if not title: raise ValueError("Title required")
-
-            # Courses already respected client-supplied IDs
-            course_id = item.get("id") or str(uuid.uuid4())
-            new_courses.append(PlannerCourse(
-                id=course_id, user_id=current_user.id, title=title.strip(),
-                teacher=item.get("teacher"), room=item.get("room"),
-                duration=_coerce_positive_int("duration", item.get("duration"), 60),
-                color=item.get("color"), category=item.get("category")
-            ))
-
-        PlannerCourse.query.filter_by(user_id=current_user.id).delete(synchronize_session=False)
-        db.session.add_all(new_courses)
+        # Ingen ägarkontroll behövs: primärnyckeln är (user_id, id), så samma
+        # klient-ID hos en annan användare är en annan rad.
+        user_id, make_row = current_user.id, _course_row
+        next_id = iter(uuid4_batch(len(courses_payload))).__next__
+        new_courses = [make_row(item, user_id, next_id) for item in courses_payload]
+        _reject_duplicate_ids(new_courses, "course")
+
+        # Upsert på (user_id, id) + en DELETE av kurser som inte längre finns
+        # med, i stället för att radera och skriva om alla kurser varje gång.
+        stale = delete(PlannerCourse).where(PlannerCourse.user_id == user_id)
+        if new_courses:
+            _upsert_in_pages(PlannerCourse, new_courses, ["user_id", "id"], _COURSE_UPSERT_COLUMNS)
+            stale = stale.where(PlannerCourse.id.notin_([row["id"] for row in new_courses]))
+        db.session.execute(stale)
         db.session.commit()
         return success_response({"count": len(new_courses)}, 201)
     except Exception as e:
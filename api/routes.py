@@ -1,28 +1,95 @@
 # api/routes.py
-from flask import Blueprint, jsonify, request
-from sqlalchemy import text, or_, and_
+from flask import Blueprint, current_app, request
+from sqlalchemy import text, or_, delete, select
 from services.db_config import db, DriveFile
 from services.drive_connect import authenticate_drive_api, build_folder_tree, save_to_database_with_session
 from config.settings import FOLDER_ID
-from api.auth_routes import token_required
+# success_response/error_response importeras härifrån av flera blueprints;
+# de delar orjson-implementationen i auth_routes.
+from api.auth_routes import token_required, success_response, error_response
 import logging
+import orjson
+import time
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 api = Blueprint('api', __name__)
 
 
-def success_response(data=None, status_code=200):
-    return jsonify({"success": True, "data": data if data is not None else {}, "error": None}), status_code
-
-
-def error_response(message, status_code=400, data=None):
-    return jsonify({"success": False, "data": data, "error": message}), status_code
-
-def check_database_connection():
-    """Check database connection"""
+# Läs-endpoints hämtar bara de kolumner som serialiseras: Row-tupler i stället
+# för ORM-instanser med identity map och instance state.
+_FILE_COLUMNS = (
+    DriveFile.id,
+    DriveFile.name,
+    DriveFile.url,
+    DriveFile.tags,
+    DriveFile.notebooklm,
+    DriveFile.file_path,
+    DriveFile.created_time,
+)
+_SECTION_COLUMNS = (DriveFile.id, DriveFile.name, DriveFile.file_path)
+
+_FILE_BATCH_SIZE = 1000
+
+def _encode_files(files):
+    return b"[" + b",".join(files) + b"]"
+
+def _encode_sections(sections):
+    """success_response-kuvertet för /files, skrivet sektion för sektion.
+
+    Fillistorna innehåller redan orjson-kodade filer; bara skalet runt dem
+    kodas här, så hela objektträdet aldrig behöver finnas som dicts.
+    """
+    dumps = orjson.dumps
+    yield b'{"success":true,"data":['
+    for i, section in enumerate(sections):
+        subsections = b",".join(
+            dumps(name) + b':{"name":' + dumps(sub["name"]) + b',"path":' + dumps(sub["path"])
+            + b',"files":' + _encode_files(sub["files"]) + b"}"
+            for name, sub in section["subsections"].items()
+        )
+        yield (b"," if i else b"") + b'{"name":' + dumps(section["name"]) + b',"path":' + dumps(section["path"]) \
+            + b',"subsections":{' + subsections + b'},"files":' + _encode_files(section["files"]) + b"}"
+    yield b'],"error":null}'
+
+def _section_of(file_path):
+    """(toppmapp, subsektion) för en fil; (None, None) för filer i roten.
+
+    Ex: "/A/B/file.md" -> ("A", "B"), "A/file.md" -> ("A", None). Bara en
+    nivå av subsections. Vanliga sökvägar avgörs med find() utan att hela
+    sökvägen splittas; tomma segment ("A//x") går via den fullständiga vägen.
+    """
+    p = (file_path or "/").lstrip("/")
+    first = p.find("/")
+    if first < 0:
+        return None, None
+    second = p.find("/", first + 1)
+    if second < 0:
+        if first + 1 < len(p):
+            return p[:first], None
+    elif second > first + 1 and second + 1 < len(p) and p[second + 1] != "/":
+        return p[:first], p[first + 1:second]
+
+    parts = [part for part in p.split("/") if part]
+    if len(parts) <= 1:
+        return None, None
+    return parts[0], (parts[1] if len(parts) >= 3 else None)
+
+# Senaste lyckade DB-probe (time.monotonic()). Lastbalanserare pollar /health
+# ofta; inom _HEALTH_TTL svarar vi utan att låna en anslutning ur poolen.
+# Skrivningen är idempotent, så ingen lås behövs mellan trådar.
+_HEALTH_TTL = 1.0
+_last_db_ok = 0.0
+
+def check_database_connection(deep=False):
+    """Check database connection; deep=True kringgår cachen och pingar alltid."""
+    global _last_db_ok
+    now = time.monotonic()
+    if not deep and now - _last_db_ok < _HEALTH_TTL:
+        return "connected"
     try:
         db.session.execute(text("SELECT 1"))
+        _last_db_ok = now
         return "connected"
     except Exception as e:
         logger.error(f"Database connection error: {str(e)}")
@@ -31,7 +98,7 @@ def check_database_connection():
 @api.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    db_status = check_database_connection()
+    db_status = check_database_connection(deep=request.args.get("deep") == "1")
     if db_status == "connected":
         return success_response({"status": "healthy", "database": db_status})
     return error_response("unhealthy", 500, {"database": db_status})
@@ -41,68 +108,76 @@ def health_check():
 def get_files(current_user):
     """Get all files (is_folder=False) with optional search, grouped by top-level folder."""
     try:
-        query = DriveFile.query.filter_by(is_folder=False, user_id=current_user.id)
+        query = select(*_FILE_COLUMNS).filter_by(is_folder=False, user_id=current_user.id)
 
         # Optional search
         q = (request.args.get('search') or "").strip()
         if q:
             like = f"%{q}%"
-            query = query.filter(or_(
+            query = query.where(or_(
                 DriveFile.name.ilike(like),
                 DriveFile.tags.ilike(like),
                 DriveFile.file_path.ilike(like)
             ))
 
-        files = query.all()
-        logger.info(f"Found {len(files)} files matching query")
+        # yield_per: raderna läses i batchar och varje fil kodas direkt till
+        # orjson-bytes, så varken alla Row-objekt eller en dict per fil ligger
+        # kvar i minnet medan trädet byggs.
+        files = db.session.execute(query.execution_options(yield_per=_FILE_BATCH_SIZE))
+        count = 0
 
         # Build grouped structure: { top_folder: { name, path, subsections, files } }
         top_level_sections = {}
-
-        for f in files:
-            # Normalisera och splitta sökväg. Ex: "/A/B/file.md" -> ["A", "B", "file.md"]
-            parts = (f.file_path or "/").lstrip("/").split("/")
-            parts = [p for p in parts if p]  # ta bort tomma
-
-            if not parts or len(parts) == 1:
-                top_folder = "Uncategorized"
-                top_path = "/"
-                subsection = None
+        # (top_folder, subsection) -> fillistan raden ska in i. En uppslagning
+        # per fil i stället för flera nästlade dict-uppslag och medlemskapstester.
+        buckets = {}
+
+        for file_id, name, url, tags, notebooklm, file_path, created_time in files:
+            top_folder, subsection = _section_of(file_path)
+            if top_folder is None:
+                top_folder, top_path = "Uncategorized", "/"
             else:
-                top_folder = parts[0]
                 top_path = f"/{top_folder}"
-                subsection = parts[1] if len(parts) >= 3 else None  # endast en nivå av subsections
-
-            if top_folder not in top_level_sections:
-                top_level_sections[top_folder] = {
-                    "name": top_folder,
-                    "path": top_path,
-                    "subsections": {},
-                    "files": []
-                }
-
-            file_payload = {
-                'id': f.id,
-                'name': f.name,
-                'url': f.url,
-                'tags': f.tags.split(',') if f.tags else [],
-                'notebooklm': f.notebooklm,
-                'file_path': f.file_path,
-                'created_time': f.created_time.isoformat() if f.created_time else None
-            }
-
-            if subsection:
-                if subsection not in top_level_sections[top_folder]["subsections"]:
-                    top_level_sections[top_folder]["subsections"][subsection] = {
+
+            count += 1
+            file_payload = orjson.dumps({
+                'id': file_id,
+                'name': name,
+                'url': url,
+                'tags': tags.split(',') if tags else [],
+                'notebooklm': notebooklm,
+                'file_path': file_path,
+                # orjson skriver datetime som ISO 8601 (samma som isoformat())
+                'created_time': created_time
+            })
+
+            key = (top_folder, subsection)
+            target = buckets.get(key)
+            if target is None:
+                section = top_level_sections.get(top_folder)
+                if section is None:
+                    section = top_level_sections[top_folder] = {
+                        "name": top_folder,
+                        "path": top_path,
+                        "subsections": {},
+                        "files": []
+                    }
+                    buckets[(top_folder, None)] = section["files"]
+                if subsection is None:
+                    target = section["files"]
+                else:
+                    target = buckets[key] = []
+                    section["subsections"][subsection] = {
                         "name": subsection,
                         "path": f"{top_path}/{subsection}",
-                        "files": []
+                        "files": target
                     }
-                top_level_sections[top_folder]["subsections"][subsection]["files"].append(file_payload)
-            else:
-                top_level_sections[top_folder]["files"].append(file_payload)
+            target.append(file_payload)
 
-        return success_response(list(top_level_sections.values()))
+        logger.info(f"Found {count} files matching query")
+        return current_app.response_class(
+            _encode_sections(top_level_sections.values()), mimetype="application/json"
+        ), 200
 
     except Exception as e:
         logger.error(f"Error in get_files: {str(e)}")
@@ -114,6 +189,10 @@ def get_files(current_user):
 def update_files(current_user):
     """Update files from Google Drive using a dedicated session."""
     logger.info("Starting update from Google Drive")
+    user_id = current_user.id
+    # token_required kan ha läst användaren via sessionen; släpp den
+    # anslutningen till poolen så att ingen hålls under Drive-anropen nedan.
+    db.session.close()
     try:
         # 1) Hämta data från Drive utanför DB-transaktion
         logger.info("Fetching data from Google Drive")
@@ -122,24 +201,16 @@ def update_files(current_user):
 
         session = db.session
         try:
-            logger.info("Finding notes to preserve")
-            notes_to_preserve = session.query(DriveFile).filter(
-                and_(
-                    or_(DriveFile.url.is_(None), DriveFile.url == ''),
-                    DriveFile.is_folder.is_(False),
-                    DriveFile.user_id == current_user.id
-                )
-            ).all()
-            preserved_notes = {n.file_path: n for n in notes_to_preserve}
-            logger.info(f"Found {len(preserved_notes)} notes to preserve")
-
+            # Egna anteckningar (url saknas) rörs inte av DELETE:n nedan, så de
+            # behöver varken läsas in eller skickas vidare.
             logger.info("Clearing existing Google Drive records")
-            session.query(DriveFile).filter(
-                and_(DriveFile.url.isnot(None), DriveFile.user_id == current_user.id)
-            ).delete(synchronize_session=False)
+            deleted = session.execute(
+                delete(DriveFile).where(DriveFile.url.isnot(None), DriveFile.user_id == user_id)
+            ).rowcount
+            logger.info(f"Removed {deleted} Google Drive records")
 
             logger.info("Saving new data to database")
-            save_to_database_with_session(folder_tree, current_user.id, session)
+            save_to_database_with_session(folder_tree, user_id, session)
 
             session.commit()
             logger.info("Successfully updated files from Google Drive")
@@ -162,13 +233,16 @@ def update_files(current_user):
 def get_sections(current_user):
     """Get all unique sections/folders (is_folder=True)."""
     try:
-        files = DriveFile.query.filter_by(is_folder=True, user_id=current_user.id) \
-                               .order_by(DriveFile.file_path.asc()).all()
+        rows = db.session.execute(
+            select(*_SECTION_COLUMNS)
+            .filter_by(is_folder=True, user_id=current_user.id)
+            .order_by(DriveFile.file_path.asc())
+        )
         sections = [{
-            'id': f.id,
-            'name': f.name,
-            'path': f.file_path
-        } for f in files]
+            'id': section_id,
+            'name': name,
+            'path': path
+        } for section_id, name, path in rows]
 
         logger.info(f"Found {len(sections)} sections")
         return success_response(sections)
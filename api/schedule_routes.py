@@ -1,19 +1,21 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, g, jsonify, request
 from services.db_config import db
-from models.schedule_models import Activity, FamilyMember, Settings
+from services.db_retry import retry_on_connection_error
+from services.ids import uuid4_batch
+from models.schedule_models import Activity, FamilyMember, Settings, activity_participants
 from api.auth_routes import token_required
 from services.prompts import build_parse_prompt
 from services.llm_client import LLMError, is_llm_configured, parse_schedule_with_llm
 from services.ai_postprocess import normalize_and_align
+from services.dates import parse_iso_day
 
 from requests import RequestException
 from requests.exceptions import Timeout
 
-from sqlalchemy.exc import OperationalError
-from sqlalchemy import func
-from time import sleep
+from sqlalchemy import func, select
+from sqlalchemy.orm import load_only, raiseload, selectinload
 from datetime import datetime, date, timedelta
-from functools import wraps
+from functools import lru_cache
 import uuid
 import logging
 import json
@@ -41,24 +43,6 @@ def ensure_series_id(activity: dict) -> dict:
     return normalized
 
 
-# ---------------- Retry-hjälpare ----------------
-def retry_on_connection_error(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        for attempt in range(3):
-            try:
-                return func(*args, **kwargs)
-            except OperationalError as e:
-                logger.warning("DB OperationalError (försök %s/3): %s", attempt + 1, e)
-                db.session.rollback()
-                if attempt < 2:
-                    sleep(0.5)
-                    continue
-                raise
-
-    return wrapper
-
-
 # ---------------- Hjälpfunktioner ----------------
 SV_WEEKDAYS = {
     1: "Måndag",
@@ -73,8 +57,17 @@ SV_TO_NUM = {v.lower(): k for k, v in SV_WEEKDAYS.items()}
 
 
 def _parse_time_hhmm(value: str):
+    # Typkontrollen före cachen: osäkra värden (listor etc.) är inte hashbara
     if not isinstance(value, str) or len(value) not in (4, 5):
         raise ValueError("Time must be 'HH:MM'")
+    return _parse_time_cached(value)
+
+
+@lru_cache(maxsize=2048)
+def _parse_time_cached(value: str):
+    # Det finns bara 1440 giltiga klockslag och samma värden återkommer för
+    # varje instans i en import; datetime är immutabel så resultatet delas.
+    # Ogiltiga värden kastar och cachas därför inte.
     parts = value.split(":")
     if len(parts) != 2:
         raise ValueError("Time must be 'HH:MM'")
@@ -106,19 +99,31 @@ def _coerce_optional_int(name: str, val):
         raise ValueError(f"{name} must be an integer")
 
 
+# Alla vanliga former (1..7, "1".."7", kanoniskt och gemener) -> kanoniskt
+# namn, så att _norm_day oftast klarar sig med ett enda dict-uppslag
+_DAY_CANON = {}
+for _num, _name in SV_WEEKDAYS.items():
+    _DAY_CANON[_num] = _name
+    _DAY_CANON[str(_num)] = _name
+    _DAY_CANON[_name] = _name
+    _DAY_CANON[_name.lower()] = _name
+
+
 def _norm_day(d) -> str:
-    if isinstance(d, int):
-        if 1 <= d <= 7:
-            return SV_WEEKDAYS[d]
-        raise ValueError("day int must be 1..7 (ISO, Måndag=1)")
     if isinstance(d, str):
-        s = d.strip().lower()
-        if s.isdigit():
-            i = int(s)
-            if 1 <= i <= 7:
-                return SV_WEEKDAYS[i]
-        if s in SV_TO_NUM:
-            return SV_WEEKDAYS[SV_TO_NUM[s]]
+        day = _DAY_CANON.get(d) or _DAY_CANON.get(d.strip().lower())
+        if day is not None:
+            return day
+        # Ovanliga sifferformer ("01", icke-ASCII-siffror) som int() godtar
+        s = d.strip()
+        if s.isdigit() and 1 <= int(s) <= 7:
+            return SV_WEEKDAYS[int(s)]
+    elif isinstance(d, int):
+        # isinstance-kontrollen först: 1.0 hashar som 1 men ska inte godtas
+        day = _DAY_CANON.get(d)
+        if day is not None:
+            return day
+        raise ValueError("day int must be 1..7 (ISO, Måndag=1)")
     raise ValueError("day must be a Swedish weekday name or 1..7")
 
 
@@ -160,6 +165,14 @@ def _validate_member_name(name, user_id, exclude_id=None):
     return name.strip()
 
 
+def _parse_iso_date(value: str) -> date:
+    # strptime bara för ovanliga former som den också godtar (t.ex. "2025-3-5")
+    parsed = parse_iso_day(value)
+    if parsed is None:
+        parsed = datetime.strptime(value, "%Y-%m-%d").date()
+    return parsed
+
+
 def _validate_activity_payload(raw: dict):
     if not isinstance(raw, dict):
         raise ValueError("Each activity must be an object")
@@ -214,7 +227,7 @@ def _validate_activity_payload(raw: dict):
         if not isinstance(rec_end_raw, str):
             raise ValueError("recurringEndDate must be 'YYYY-MM-DD'")
         try:
-            end_date = datetime.strptime(rec_end_raw, "%Y-%m-%d").date()
+            end_date = _parse_iso_date(rec_end_raw)
         except ValueError:
             raise ValueError("recurringEndDate must be 'YYYY-MM-DD'")
         if end_date < start_date:
@@ -224,43 +237,55 @@ def _validate_activity_payload(raw: dict):
     return base_payload
 
 
+# Fält som kopieras oförändrade från en inkommande aktivitet till varje instans
+_INSTANCE_FIELDS = frozenset({
+    "name",
+    "icon",
+    "startTime",
+    "endTime",
+    "participants",
+    "location",
+    "notes",
+    "color",
+    "seriesId",
+})
+
+
 def _expand_instances(v: dict) -> list[dict]:
-    base = {
-        k: v[k]
-        for k in [
-            "name",
-            "icon",
-            "startTime",
-            "endTime",
-            "participants",
-            "location",
-            "notes",
-            "color",
-            "seriesId",
-        ]
-        if k in v
-    }
+    # Snittet räknas i C och itererar den mindre sidan, i stället för ett
+    # medlemskapstest per tillåtet fält
+    base = {k: v[k] for k in _INSTANCE_FIELDS.intersection(v)}
+    # base.copy() plus tre tilldelningar är ungefär dubbelt så snabbt som
+    # {**base, ...} och behåller samma nycklar som base råkar ha
+    new = base.copy
     out = []
-    end_str = v.get("recurringEndDate")
-    if end_str:
-        start_monday = date.fromisocalendar(v["year"], v["week"], 1)
-        try:
-            end_date = datetime.strptime(end_str, "%Y-%m-%d").date()
-        except ValueError:
-            raise ValueError("recurringEndDate must be YYYY-MM-DD")
-        current_monday = start_monday
+    append = out.append
+    # _validate_activity_payload har redan parsat slutdatumet till ett date
+    end_date = v.get("recurringEndDate")
+    if end_date:
+        offsets = [(d, timedelta(days=SV_TO_NUM[d.lower()] - 1)) for d in v["days"]]
+        current_monday = date.fromisocalendar(v["year"], v["week"], 1)
+        one_week = timedelta(weeks=1)
         while current_monday <= end_date:
-            for d in v["days"]:
-                day_num = SV_TO_NUM[d.lower()]
-                inst_date = current_monday + timedelta(days=day_num - 1)
+            for d, offset in offsets:
+                inst_date = current_monday + offset
                 if inst_date > end_date:
                     continue
                 iso_year, iso_week, _ = inst_date.isocalendar()
-                out.append({**base, "day": d, "week": iso_week, "year": iso_year})
-            current_monday += timedelta(weeks=1)
+                inst = new()
+                inst["day"] = d
+                inst["week"] = iso_week
+                inst["year"] = iso_year
+                append(inst)
+            current_monday += one_week
         return out
+    week, year = v["week"], v["year"]
     for d in v["days"]:
-        out.append({**base, "day": d, "week": v["week"], "year": v["year"]})
+        inst = new()
+        inst["day"] = d
+        inst["week"] = week
+        inst["year"] = year
+        append(inst)
     return out
 
 
@@ -283,6 +308,120 @@ def _activity_to_dict(a: Activity) -> dict:
     }
 
 
+def _member_lookup(user_id: str) -> dict:
+    """Request-scoped memo of the user's family members by id (only id/name loaded)."""
+    cached = g.get("_family_lookup")
+    if cached is not None and cached[0] == user_id:
+        return cached[1]
+    members = (
+        FamilyMember.query.options(load_only(FamilyMember.id, FamilyMember.name))
+        .filter_by(user_id=user_id)
+        .all()
+    )
+    by_id = {m.id: m for m in members}
+    g._family_lookup = (user_id, by_id)
+    return by_id
+
+
+def _owned_member_ids(user_id: str, payloads: list[dict]) -> set:
+    # Skapa-vägarna behöver bara veta vilka refererade id:n som tillhör
+    # användaren: en id-kolumnfråga för just dem, ingen fråga alls utan deltagare
+    wanted = {pid for v in payloads for pid in v.get("participants", ())}
+    if not wanted:
+        return set()
+    return set(
+        db.session.scalars(
+            select(FamilyMember.id).where(
+                FamilyMember.user_id == user_id, FamilyMember.id.in_(wanted)
+            )
+        )
+    )
+
+
+def _resolve_participants(user_id: str, payloads: list[dict]) -> None:
+    """Rewrite each validated payload's participants to a tuple of owned member ids.
+
+    Görs en gång per payload före _expand_instances, så att alla instanser i
+    en serie delar samma redan lösta tuple. Okända id:n och andra användares
+    medlemmar hoppas över; dubbletter tas bort så att kopplingstabellen inte
+    får samma par två gånger.
+    """
+    owned = _owned_member_ids(user_id, payloads)
+    for v in payloads:
+        v["participants"] = tuple(pid for pid in dict.fromkeys(v["participants"]) if pid in owned)
+
+
+def _insert_activity_instances(user_id: str, instances: list[dict]) -> list[dict]:
+    """Bulk-insert expanded instances and return them serialized like _activity_to_dict.
+
+    Aktiviteterna och kopplingsraderna skrivs med varsin executemany via Core,
+    så importen slipper ORM:ens identity map och en unit-of-work per objekt.
+    Instansernas participants ska redan vara lösta av _resolve_participants;
+    anroparen committar.
+    """
+    rows = []
+    links = []
+    created = []
+    # Alla id:n förallokeras så att kopplingsraderna kan peka på aktiviteterna
+    # utan en flush emellan
+    for inst, activity_id in zip(instances, uuid4_batch(len(instances))):
+        participant_ids = inst["participants"]
+        # Map from camelCase (JS) to snake_case (Python/DB)
+        rows.append({
+            "id": activity_id,
+            "user_id": user_id,
+            "series_id": inst["seriesId"],
+            "name": inst["name"],
+            "icon": inst.get("icon"),
+            "day": inst["day"],
+            "week": inst["week"],
+            "year": inst["year"],
+            "start_time": inst["startTime"],
+            "end_time": inst["endTime"],
+            "location": inst.get("location"),
+            "notes": inst.get("notes"),
+            "color": inst.get("color"),
+        })
+        links.extend(
+            {"activity_id": activity_id, "family_member_id": pid} for pid in participant_ids
+        )
+        created.append({
+            "id": activity_id,
+            "seriesId": inst["seriesId"],
+            "name": inst["name"],
+            "icon": inst.get("icon"),
+            "day": inst["day"],
+            "week": inst["week"],
+            "year": inst["year"],
+            "startTime": inst["startTime"],
+            "endTime": inst["endTime"],
+            "location": inst.get("location"),
+            "notes": inst.get("notes"),
+            "color": inst.get("color"),
+            "participants": list(participant_ids),
+        })
+    if rows:
+        db.session.execute(Activity.__table__.insert(), rows)
+    if links:
+        db.session.execute(activity_participants.insert(), links)
+    return created
+
+
+def _activity_query():
+    """Activity query with participants eager-loaded.
+
+    Deltagarna hämtas i en enda IN-fråga per resultatmängd i stället för en
+    SELECT per aktivitet; bara id behövs för serialiseringen. Optionerna byggs
+    per anrop eftersom de konfigurerar mapparna när de skapas. Med
+    SQLA_RAISELOAD påslaget (tester/dev) blir varje annan lazy load ett fel i
+    stället för en tyst extra fråga per rad.
+    """
+    options = [selectinload(Activity.participants).load_only(FamilyMember.id)]
+    if current_app.config.get("SQLA_RAISELOAD", False):
+        options.append(raiseload("*"))
+    return Activity.query.options(*options)
+
+
 # ---------------- Routes: Settings ----------------
 @schedule_bp.route("/settings", methods=["GET"])
 @token_required
@@ -310,7 +449,6 @@ def get_schedule_settings(current_user):
 
 @schedule_bp.route("/settings", methods=["PUT"])
 @token_required
-@retry_on_connection_error
 def update_schedule_settings(current_user):
     data = request.get_json(silent=True) or {}
     s = Settings.query.filter_by(user_id=current_user.id).first()
@@ -384,7 +522,6 @@ def get_family_members(current_user):
 # ---------------- Routes: Family member CRUD ----------------
 @schedule_bp.route("/family-members", methods=["POST"])
 @token_required
-@retry_on_connection_error
 def create_family_member(current_user):
     data = request.get_json(silent=True) or {}
     try:
@@ -419,7 +556,6 @@ def create_family_member(current_user):
 
 @schedule_bp.route("/family-members/<member_id>", methods=["PUT"])
 @token_required
-@retry_on_connection_error
 def update_family_member(current_user, member_id):
     fm = FamilyMember.query.filter_by(id=member_id, user_id=current_user.id).first()
     if not fm:
@@ -447,7 +583,6 @@ def update_family_member(current_user, member_id):
 
 @schedule_bp.route("/family-members/<member_id>", methods=["DELETE"])
 @token_required
-@retry_on_connection_error
 def delete_family_member(current_user, member_id):
     fm = FamilyMember.query.filter_by(id=member_id, user_id=current_user.id).first()
     if not fm:
@@ -461,7 +596,6 @@ def delete_family_member(current_user, member_id):
 
 @schedule_bp.route("/family-members/reorder", methods=["POST"])
 @token_required
-@retry_on_connection_error
 def reorder_family_members(current_user):
     data = request.get_json(silent=True) or {}
     order = data.get("order")
@@ -501,9 +635,11 @@ def get_activities(current_user):
     except ValueError as e:
         return error_response(str(e), 400)
 
-    activities = Activity.query.filter_by(
-        user_id=current_user.id, year=year, week=week
-    ).all()
+    activities = (
+        _activity_query()
+        .filter_by(user_id=current_user.id, year=year, week=week)
+        .all()
+    )
 
     result = [_activity_to_dict(a) for a in activities]
     return success_response(result)
@@ -511,7 +647,6 @@ def get_activities(current_user):
 
 @schedule_bp.route("/activities", methods=["POST"])
 @token_required
-@retry_on_connection_error
 def create_activity(current_user):
     payload = request.get_json(silent=True) or {}
     if not payload:
@@ -519,56 +654,23 @@ def create_activity(current_user):
 
     try:
         v = _validate_activity_payload(payload)
+        _resolve_participants(current_user.id, [v])
         instances = _expand_instances(v)
     except ValueError as ve:
         return error_response(str(ve), 400)
 
-    members = FamilyMember.query.filter_by(user_id=current_user.id).all()
-    by_id = {m.id: m for m in members}  # kept for parity, even if not used below
-
-    created_activities = []
-    for inst in instances:
-        # Map from camelCase (JS) to snake_case (Python/DB)
-        inst_for_db = {
-            "series_id": inst["seriesId"],
-            "name": inst["name"],
-            "icon": inst.get("icon"),
-            "day": inst["day"],
-            "week": inst["week"],
-            "year": inst["year"],
-            "start_time": inst["startTime"],
-            "end_time": inst["endTime"],
-            "location": inst.get("location"),
-            "notes": inst.get("notes"),
-            "color": inst.get("color"),
-        }
-        a = Activity(id=str(uuid.uuid4()), user_id=current_user.id, **inst_for_db)
-
-        # Add participants
-        participant_ids = inst.get("participants", [])
-        resolved_participants = FamilyMember.query.filter(
-            FamilyMember.id.in_(participant_ids)
-        ).all()
-        a.participants.extend(resolved_participants)
-
-        db.session.add(a)
-        created_activities.append(a)
-
+    created = _insert_activity_instances(current_user.id, instances)
     db.session.commit()
     if "recurringEndDate" in payload:
-        serialized = [_activity_to_dict(a) for a in created_activities]
-        return success_response(serialized, 201)
+        return success_response(created, 201)
 
-    return success_response(
-        {"id": created_activities[0].id, "created": len(created_activities)}, 201
-    )
+    return success_response({"id": created[0]["id"], "created": len(created)}, 201)
 
 
 @schedule_bp.route("/activities/<activity_id>", methods=["PUT"])
 @token_required
-@retry_on_connection_error
 def update_activity(current_user, activity_id):
-    a = Activity.query.filter_by(id=activity_id, user_id=current_user.id).first()
+    a = _activity_query().filter_by(id=activity_id, user_id=current_user.id).first()
     if not a:
         return error_response("Activity not found", 404)
 
@@ -595,8 +697,7 @@ def update_activity(current_user, activity_id):
         if "color" in data:
             a.color = data["color"]
         if "participants" in data:
-            members = FamilyMember.query.filter_by(user_id=current_user.id).all()
-            by_id = {m.id: m for m in members}
+            by_id = _member_lookup(current_user.id)
             a.participants.clear()
             for pid in data["participants"] or []:
                 if pid in by_id:
@@ -610,9 +711,8 @@ def update_activity(current_user, activity_id):
 
 @schedule_bp.route("/activities/<activity_id>", methods=["DELETE"])
 @token_required
-@retry_on_connection_error
 def delete_activity(current_user, activity_id):
-    a = Activity.query.filter_by(id=activity_id, user_id=current_user.id).first()
+    a = _activity_query().filter_by(id=activity_id, user_id=current_user.id).first()
     if not a:
         return error_response("Activity not found", 404)
     db.session.delete(a)
@@ -622,10 +722,13 @@ def delete_activity(current_user, activity_id):
 
 @schedule_bp.route("/activities/series/<series_id>", methods=["PUT"])
 @token_required
-@retry_on_connection_error
 def update_activity_series(current_user, series_id):
     data = request.get_json(silent=True) or {}
-    acts = Activity.query.filter_by(series_id=series_id, user_id=current_user.id).all()
+    acts = (
+        _activity_query()
+        .filter_by(series_id=series_id, user_id=current_user.id)
+        .all()
+    )
     if not acts:
         return error_response("No activities for series", 404)
 
@@ -641,7 +744,6 @@ def update_activity_series(current_user, series_id):
     ]
 
     try:
-        members_cache = None
         for a in acts:
             for key, value in data.items():
                 if key not in allowed:
@@ -651,9 +753,7 @@ def update_activity_series(current_user, series_id):
                 elif key == "endTime":
                     a.end_time = _time_to_str(_parse_time_hhmm(value))
                 elif key == "participants":
-                    if members_cache is None:
-                        members_cache = FamilyMember.query.filter_by(user_id=current_user.id).all()
-                        members_cache = {m.id: m for m in members_cache}
+                    members_cache = _member_lookup(current_user.id)
                     a.participants.clear()
                     for pid in value or []:
                         if pid in members_cache:
@@ -701,9 +801,12 @@ def update_activity_series(current_user, series_id):
 
 @schedule_bp.route("/activities/series/<series_id>", methods=["DELETE"])
 @token_required
-@retry_on_connection_error
 def delete_activity_series(current_user, series_id):
-    acts = Activity.query.filter_by(series_id=series_id, user_id=current_user.id).all()
+    acts = (
+        _activity_query()
+        .filter_by(series_id=series_id, user_id=current_user.id)
+        .all()
+    )
     if not acts:
         return error_response("No activities for series", 404)
     for a in acts:
@@ -789,7 +892,6 @@ def ai_health(current_user):
 
 @schedule_bp.route("/add-activities", methods=["POST"])
 @token_required
-@retry_on_connection_error
 def add_activities_from_json(current_user):
     try:
         payload = request.get_json(silent=True)
@@ -800,39 +902,13 @@ def add_activities_from_json(current_user):
         if not isinstance(activities, list) or not activities:
             return error_response("Provide a non-empty array of activities", 400)
 
+        validated = [_validate_activity_payload(raw) for raw in activities]
+        _resolve_participants(current_user.id, validated)
         all_instances = []
-        for raw in activities:
-            v = _validate_activity_payload(raw)
+        for v in validated:
             all_instances.extend(_expand_instances(v))
 
-        members = FamilyMember.query.filter_by(user_id=current_user.id).all()
-        by_id = {m.id: m for m in members}  # kept for parity
-
-        for inst in all_instances:
-            # Map from camelCase (JS) to snake_case (Python/DB)
-            inst_for_db = {
-                "series_id": inst["seriesId"],
-                "name": inst["name"],
-                "icon": inst.get("icon"),
-                "day": inst["day"],
-                "week": inst["week"],
-                "year": inst["year"],
-                "start_time": inst["startTime"],
-                "end_time": inst["endTime"],
-                "location": inst.get("location"),
-                "notes": inst.get("notes"),
-                "color": inst.get("color"),
-            }
-            a = Activity(id=str(uuid.uuid4()), user_id=current_user.id, **inst_for_db)
-
-            participant_ids = inst.get("participants", [])
-            resolved_participants = FamilyMember.query.filter(
-                FamilyMember.id.in_(participant_ids)
-            ).all()
-            a.participants.extend(resolved_participants)
-
-            db.session.add(a)
-
+        _insert_activity_instances(current_user.id, all_instances)
         db.session.commit()
         return success_response({"message": f"Activities added: {len(all_instances)}"}, 201)
 
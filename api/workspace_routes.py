@@ -1,11 +1,9 @@
 from flask import Blueprint, request
 from services.db_config import db
+from services.db_retry import retry_on_connection_error
 from models.workspace_models import Surface, WorkspaceElement, SurfaceElement
 from api.auth_routes import token_required
 from api.routes import success_response, error_response
-from sqlalchemy.exc import OperationalError
-from functools import wraps
-from time import sleep
 import logging
 import json
 
@@ -14,22 +12,6 @@ logger = logging.getLogger(__name__)
 workspace_api = Blueprint("workspace_api", __name__)
 
 
-def retry_on_connection_error(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        for attempt in range(3):
-            try:
-                return func(*args, **kwargs)
-            except OperationalError as e:
-                logger.warning("DB OperationalError (attempt %s/3): %s", attempt + 1, e)
-                db.session.rollback()
-                if attempt < 2:
-                    sleep(0.5)
-                    continue
-                raise
-    return wrapper
-
-
 # ============================================================
 # SURFACES
 # ============================================================
@@ -48,7 +30,6 @@ def get_surfaces(current_user):
 
 @workspace_api.route("/surfaces", methods=["POST"])
 @token_required
-@retry_on_connection_error
 def create_surface(current_user):
     data = request.get_json(silent=True) or {}
     name = data.get('name', 'Untitled').strip()
@@ -72,7 +53,6 @@ def create_surface(current_user):
 
 @workspace_api.route("/surfaces/<surface_id>", methods=["PUT"])
 @token_required
-@retry_on_connection_error
 def update_surface(current_user, surface_id):
     surface = Surface.query.filter_by(id=surface_id, user_id=current_user.id).first()
     if not surface:
@@ -92,7 +72,6 @@ def update_surface(current_user, surface_id):
 
 @workspace_api.route("/surfaces/<surface_id>", methods=["DELETE"])
 @token_required
-@retry_on_connection_error
 def delete_surface(current_user, surface_id):
     surface = Surface.query.filter_by(id=surface_id, user_id=current_user.id).first()
     if not surface:
@@ -135,7 +114,6 @@ def get_surface_elements(current_user, surface_id):
 
 @workspace_api.route("/elements", methods=["POST"])
 @token_required
-@retry_on_connection_error
 def create_element(current_user):
     data = request.get_json(silent=True) or {}
     el_type = data.get('type', '').strip()
@@ -156,7 +134,6 @@ def create_element(current_user):
 
 @workspace_api.route("/elements/<element_id>", methods=["PUT"])
 @token_required
-@retry_on_connection_error
 def update_element(current_user, element_id):
     element = WorkspaceElement.query.filter_by(id=element_id, user_id=current_user.id).first()
     if not element:
@@ -174,7 +151,6 @@ def update_element(current_user, element_id):
 
 @workspace_api.route("/elements/<element_id>", methods=["DELETE"])
 @token_required
-@retry_on_connection_error
 def delete_element(current_user, element_id):
     element = WorkspaceElement.query.filter_by(id=element_id, user_id=current_user.id).first()
     if not element:
@@ -192,7 +168,6 @@ def delete_element(current_user, element_id):
 
 @workspace_api.route("/surfaces/<surface_id>/place", methods=["POST"])
 @token_required
-@retry_on_connection_error
 def place_element(current_user, surface_id):
     surface = Surface.query.filter_by(id=surface_id, user_id=current_user.id).first()
     if not surface:
@@ -234,7 +209,6 @@ def place_element(current_user, surface_id):
 
 @workspace_api.route("/placements/<placement_id>", methods=["PUT"])
 @token_required
-@retry_on_connection_error
 def update_placement(current_user, placement_id):
     placement = SurfaceElement.query.filter_by(id=placement_id).first()
     if not placement:
@@ -262,7 +236,6 @@ def update_placement(current_user, placement_id):
 
 @workspace_api.route("/placements/<placement_id>", methods=["DELETE"])
 @token_required
-@retry_on_connection_error
 def delete_placement(current_user, placement_id):
     placement = SurfaceElement.query.filter_by(id=placement_id).first()
     if not placement:
@@ -283,7 +256,6 @@ def delete_placement(current_user, placement_id):
 
 @workspace_api.route("/elements/<element_id>/mirror", methods=["POST"])
 @token_required
-@retry_on_connection_error
 def mirror_element(current_user, element_id):
     element = WorkspaceElement.query.filter_by(id=element_id, user_id=current_user.id).first()
     if not element:
@@ -324,7 +296,6 @@ def mirror_element(current_user, element_id):
 
 @workspace_api.route("/elements/<element_id>/copy", methods=["POST"])
 @token_required
-@retry_on_connection_error
 def copy_element(current_user, element_id):
     element = WorkspaceElement.query.filter_by(id=element_id, user_id=current_user.id).first()
     if not element:
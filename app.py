@@ -1,10 +1,10 @@
-from flask import Flask, jsonify, request
+from flask import Flask, request
 from flask_cors import CORS
 from services.db_config import db
-from api.routes import api
+from api.routes import api, check_database_connection
 from api.calendar_routes import calendar_api
 from api.notes_routes import notes
-from api.auth_routes import auth
+from api.auth_routes import auth, success_response, error_response
 from api.schedule_routes import schedule_bp
 from api.planner_routes import planner_api
 from api.command_center_routes import command_center_api
@@ -16,8 +16,10 @@ from config.settings import (
     DATABASE_URL,
     DATABASE_POOL_OPTIONS,
     CORS_ORIGINS,
+    CORS_CONFIG,
     SECRET_KEY
 )
+from services.cors_preflight import CorsPreflightMiddleware
 import logging
 import os
 import traceback
@@ -27,22 +29,23 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def success_response(data=None, status_code=200):
-    return jsonify({"success": True, "data": data if data is not None else {}, "error": None}), status_code
-
-
-def error_response(message, status_code=400, data=None):
-    return jsonify({"success": False, "data": data, "error": message}), status_code
+CORS_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"]
 
 
 def create_app():
     app = Flask(__name__)
 
+    # Preflights från kända origins besvaras direkt i WSGI-lagret, innan
+    # Flask bygger request-kontext och kör routing; övrigt går till CORS nedan.
+    app.wsgi_app = CorsPreflightMiddleware(
+        app.wsgi_app, CORS_ORIGINS, CORS_METHODS, max_age=CORS_CONFIG["max_age"]
+    )
+
     CORS(
         app,
         resources={r"/api/*": {
             "origins": CORS_ORIGINS,
-            "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+            "methods": CORS_METHODS,
             "allow_headers": ["Authorization", "Content-Type", "X-Requested-With"],
             "supports_credentials": True,
         }},
@@ -98,12 +101,12 @@ def create_app():
     # --- Health check ---
     @app.route('/health')
     def health_check():
-        try:
-            db.session.execute('SELECT 1')
-            return success_response({"status": "healthy", "database": "connected"})
-        except Exception as e:
-            logger.error(f"Health check failed: {str(e)}")
-            return error_response("unhealthy", 500, {"database": str(e)})
+        # Samma cachade probe som /api/health; ?deep=1 tvingar en riktig ping
+        db_status = check_database_connection(deep=request.args.get("deep") == "1")
+        if db_status == "connected":
+            return success_response({"status": "healthy", "database": db_status})
+        logger.error(f"Health check failed: {db_status}")
+        return error_response("unhealthy", 500, {"database": db_status})
 
     return app
 
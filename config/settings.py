@@ -17,12 +17,21 @@ DB_NAME = os.environ.get('DATABASE_NAME')
 DATABASE_URL = f'mysql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOSTNAME}/{DB_NAME}?charset=utf8mb4'
 
 # Database Pool Settings
+# Storlek/overflow kan skalas per driftmiljö (antal workers * trådar).
+# Poolen är per process: workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) får inte
+# överstiga MySQL-kontots max_user_connections.
+# pool_recycle måste ligga under PythonAnywheres 300 s idle-timeout för MySQL.
+# insertmanyvalues_page_size styr hur många rader planner-synkens flerrads-INSERT
+# packar per statement; sänk den om max_allowed_packet slår i taket.
 DATABASE_POOL_OPTIONS = {
-    'pool_size': 10,
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
     'pool_recycle': 280,
     'pool_pre_ping': True,
-    'pool_timeout': 30,
-    'max_overflow': 5
+    # LIFO: varma anslutningar återanvänds, överskottet hinner gå idle och återvinnas
+    'pool_use_lifo': True,
+    'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+    'insertmanyvalues_page_size': int(os.environ.get('DB_INSERT_PAGE_SIZE', 1000)),
 }
 
 # Google Drive Settings
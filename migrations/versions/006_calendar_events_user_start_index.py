@@ -0,0 +1,39 @@
+"""add (user_id, start_time) index to calendar_events
+
+get_events filters on user_id plus a start_time range and orders by
+start_time; the composite index turns that into an index range scan
+that is already in sort order.
+
+Revision ID: 006_calendar_events_user_start
+Revises: 005_family_member_utf8mb4
+Create Date: 2026-10-14
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import inspect
+
+revision: str = '006_calendar_events_user_start'
+down_revision: Union[str, Sequence[str], None] = '005_family_member_utf8mb4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _index_exists(table: str, index: str) -> bool:
+    """Check if an index already exists (safe for re-runs)."""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    return index in [i["name"] for i in insp.get_indexes(table)]
+
+
+def upgrade() -> None:
+    if not _index_exists("calendar_events", "ix_calendar_events_user_start"):
+        op.create_index(
+            "ix_calendar_events_user_start",
+            "calendar_events",
+            ["user_id", "start_time"],
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_calendar_events_user_start", table_name="calendar_events")
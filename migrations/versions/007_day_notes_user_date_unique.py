@@ -0,0 +1,49 @@
+"""add unique (user_id, date) constraint to day_notes
+
+save_day_note now issues a single INSERT ... ON DUPLICATE KEY UPDATE,
+which needs a unique key on (user_id, date) to detect the existing row.
+Any duplicates left behind by the old SELECT-then-INSERT race are removed
+first, keeping the most recently updated note.
+
+Revision ID: 007_day_notes_user_date_unique
+Revises: 006_calendar_events_user_start
+Create Date: 2026-10-14
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import inspect
+
+revision: str = '007_day_notes_user_date_unique'
+down_revision: Union[str, Sequence[str], None] = '006_calendar_events_user_start'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _unique_exists(table: str, name: str) -> bool:
+    """Check if a unique constraint already exists (safe for re-runs)."""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    return name in [u["name"] for u in insp.get_unique_constraints(table)]
+
+
+def upgrade() -> None:
+    if _unique_exists("day_notes", "uq_day_notes_user_date"):
+        return
+    op.execute(
+        """
+        DELETE older FROM day_notes AS older
+        JOIN day_notes AS newer
+          ON newer.user_id = older.user_id
+         AND newer.date = older.date
+         AND (newer.updated_at > older.updated_at
+              OR (newer.updated_at = older.updated_at AND newer.id > older.id))
+        """
+    )
+    op.create_unique_constraint(
+        "uq_day_notes_user_date", "day_notes", ["user_id", "date"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_day_notes_user_date", "day_notes", type_="unique")
@@ -0,0 +1,50 @@
+"""add user_id column and index to drive_files
+
+Replaces the one-off add_column.py script, which booted the whole app to
+run a bare ALTER TABLE and failed on every run after the first. The
+column matches DriveFile.user_id; every notes/files query filters on it,
+so it gets an index as well.
+
+Revision ID: 008_drive_files_user_id
+Revises: 007_day_notes_user_date_unique
+Create Date: 2026-10-14
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision: str = '008_drive_files_user_id'
+down_revision: Union[str, Sequence[str], None] = '007_day_notes_user_date_unique'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _column_exists(table: str, column: str) -> bool:
+    """Check if a column already exists (safe for re-runs)."""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    return column in [c["name"] for c in insp.get_columns(table)]
+
+
+def _index_exists(table: str, index: str) -> bool:
+    """Check if an index already exists (safe for re-runs)."""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    return index in [i["name"] for i in insp.get_indexes(table)]
+
+
+def upgrade() -> None:
+    if not _column_exists("drive_files", "user_id"):
+        op.add_column(
+            "drive_files",
+            sa.Column("user_id", sa.String(100), nullable=True),
+        )
+    if not _index_exists("drive_files", "ix_drive_files_user_id"):
+        op.create_index("ix_drive_files_user_id", "drive_files", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_drive_files_user_id", table_name="drive_files")
+    op.drop_column("drive_files", "user_id")
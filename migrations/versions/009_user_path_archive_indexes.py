@@ -0,0 +1,52 @@
+"""add (user_id, file_path) and (user_id, archive_name) indexes
+
+Notes queries filter drive_files on user_id plus file_path equality or a
+'prefix/%' LIKE, which a B-tree on (user_id, file_path) serves as a range
+scan. The planner filters planner_activity on user_id plus archive_name.
+The single-column ix_drive_files_user_id from 008 is a prefix of the new
+composite index and is dropped.
+
+Revision ID: 009_user_path_archive_indexes
+Revises: 008_drive_files_user_id
+Create Date: 2026-10-14
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import inspect
+
+revision: str = '009_user_path_archive_indexes'
+down_revision: Union[str, Sequence[str], None] = '008_drive_files_user_id'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _index_exists(table: str, index: str) -> bool:
+    """Check if an index already exists (safe for re-runs)."""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    return index in [i["name"] for i in insp.get_indexes(table)]
+
+
+def upgrade() -> None:
+    if not _index_exists("drive_files", "ix_drive_files_user_path"):
+        op.create_index(
+            "ix_drive_files_user_path", "drive_files", ["user_id", "file_path"]
+        )
+    # The composite index now backs the users.id foreign key, so the
+    # single-column one can go.
+    if _index_exists("drive_files", "ix_drive_files_user_id"):
+        op.drop_index("ix_drive_files_user_id", table_name="drive_files")
+
+    if not _index_exists("planner_activity", "ix_planner_activity_user_archive"):
+        op.create_index(
+            "ix_planner_activity_user_archive",
+            "planner_activity",
+            ["user_id", "archive_name"],
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_planner_activity_user_archive", table_name="planner_activity")
+    op.create_index("ix_drive_files_user_id", "drive_files", ["user_id"])
+    op.drop_index("ix_drive_files_user_path", table_name="drive_files")
@@ -0,0 +1,71 @@
+"""add parent_path column to drive_files
+
+list_files used LIKE '<path>/%' AND NOT LIKE '<path>/%/%' to find the
+direct children of a directory. Storing each row's parent directory turns
+that into an equality lookup on (user_id, parent_path).
+
+Existing rows are backfilled from file_path: notes rows ('/a/b') get the
+part before the last '/' ('/' at the top level), Drive-synced rows ('a/b',
+no leading slash) get the same with '' at the top level, which matches
+what save_to_database_with_session stores.
+
+Revision ID: 010_drive_files_parent_path
+Revises: 009_user_path_archive_indexes
+Create Date: 2026-10-14
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision: str = '010_drive_files_parent_path'
+down_revision: Union[str, Sequence[str], None] = '009_user_path_archive_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _column_exists(table: str, column: str) -> bool:
+    """Check if a column already exists (safe for re-runs)."""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    return column in [c["name"] for c in insp.get_columns(table)]
+
+
+def _index_exists(table: str, index: str) -> bool:
+    """Check if an index already exists (safe for re-runs)."""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    return index in [i["name"] for i in insp.get_indexes(table)]
+
+
+def upgrade() -> None:
+    if not _column_exists("drive_files", "parent_path"):
+        op.add_column(
+            "drive_files",
+            sa.Column("parent_path", sa.String(500), nullable=True),
+        )
+
+    op.execute(
+        """
+        UPDATE drive_files
+        SET parent_path = CASE
+            WHEN file_path = '/' THEN NULL
+            WHEN file_path LIKE '/%' AND LOCATE('/', file_path, 2) = 0 THEN '/'
+            ELSE LEFT(file_path,
+                      CHAR_LENGTH(file_path)
+                      - CHAR_LENGTH(SUBSTRING_INDEX(file_path, '/', -1)) - 1)
+        END
+        WHERE parent_path IS NULL
+        """
+    )
+
+    if not _index_exists("drive_files", "ix_drive_files_user_parent"):
+        op.create_index(
+            "ix_drive_files_user_parent", "drive_files", ["user_id", "parent_path"]
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_drive_files_user_parent", table_name="drive_files")
+    op.drop_column("drive_files", "parent_path")
@@ -0,0 +1,48 @@
+"""add unique file_id constraint to note_contents
+
+save_note and get_note now write note content with a single
+INSERT ... ON DUPLICATE KEY UPDATE keyed on file_id, which needs a unique
+key. Duplicate content rows for the same file are removed first, keeping
+the most recently updated one.
+
+Revision ID: 011_note_contents_file_unique
+Revises: 010_drive_files_parent_path
+Create Date: 2026-10-14
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import inspect
+
+revision: str = '011_note_contents_file_unique'
+down_revision: Union[str, Sequence[str], None] = '010_drive_files_parent_path'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _unique_exists(table: str, name: str) -> bool:
+    """Check if a unique constraint already exists (safe for re-runs)."""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    return name in [u["name"] for u in insp.get_unique_constraints(table)]
+
+
+def upgrade() -> None:
+    if _unique_exists("note_contents", "uq_note_contents_file_id"):
+        return
+    op.execute(
+        """
+        DELETE older FROM note_contents AS older
+        JOIN note_contents AS newer
+          ON newer.file_id = older.file_id
+         AND (newer.updated_time > older.updated_time
+              OR (newer.updated_time = older.updated_time AND newer.id > older.id))
+        """
+    )
+    op.create_unique_constraint(
+        "uq_note_contents_file_id", "note_contents", ["file_id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_note_contents_file_id", "note_contents", type_="unique")
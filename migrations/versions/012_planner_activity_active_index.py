@@ -0,0 +1,54 @@
+"""extend the planner_activity archive index with deleted_at
+
+Every planner read and soft-delete filters on user_id, archive_name and
+deleted_at IS NULL. MySQL has no partial indexes, so the nearest
+equivalent of "active rows only" is to put deleted_at last in the
+composite index: the active subset is then a contiguous range per
+(user_id, archive_name). The (user_id, archive_name) index from 009 and
+the single-column ix_planner_activity_user_id are prefixes of the new one
+and are dropped; planner_activity is written on every sync, and no foreign
+key references it.
+
+Revision ID: 012_planner_activity_active_index
+Revises: 011_note_contents_file_unique
+Create Date: 2026-10-14
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import inspect
+
+revision: str = '012_planner_activity_active_index'
+down_revision: Union[str, Sequence[str], None] = '011_note_contents_file_unique'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _index_exists(table: str, index: str) -> bool:
+    """Check if an index already exists (safe for re-runs)."""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    return index in [i["name"] for i in insp.get_indexes(table)]
+
+
+def upgrade() -> None:
+    if not _index_exists("planner_activity", "ix_planner_activity_active"):
+        op.create_index(
+            "ix_planner_activity_active",
+            "planner_activity",
+            ["user_id", "archive_name", "deleted_at"],
+        )
+    if _index_exists("planner_activity", "ix_planner_activity_user_archive"):
+        op.drop_index("ix_planner_activity_user_archive", table_name="planner_activity")
+    if _index_exists("planner_activity", "ix_planner_activity_user_id"):
+        op.drop_index("ix_planner_activity_user_id", table_name="planner_activity")
+
+
+def downgrade() -> None:
+    op.create_index("ix_planner_activity_user_id", "planner_activity", ["user_id"])
+    op.create_index(
+        "ix_planner_activity_user_archive",
+        "planner_activity",
+        ["user_id", "archive_name"],
+    )
+    op.drop_index("ix_planner_activity_active", table_name="planner_activity")
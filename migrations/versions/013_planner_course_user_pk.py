@@ -0,0 +1,48 @@
+"""make (user_id, id) the primary key of planner_course
+
+Course ids are generated by the client and only need to be unique per
+user. With user_id in the key another user's id can never collide with
+(or overwrite) an existing course, so the course sync no longer needs an
+ownership pre-check. user_id leads the key, which also serves the
+WHERE user_id = ? lookups, so the separate user_id index is dropped.
+
+Revision ID: 013_planner_course_user_pk
+Revises: 012_planner_activity_active_index
+Create Date: 2026-10-14
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import inspect
+
+revision: str = '013_planner_course_user_pk'
+down_revision: Union[str, Sequence[str], None] = '012_planner_activity_active_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _primary_key_columns(table: str) -> list:
+    conn = op.get_bind()
+    insp = inspect(conn)
+    return insp.get_pk_constraint(table)["constrained_columns"]
+
+
+def _index_exists(table: str, index: str) -> bool:
+    """Check if an index already exists (safe for re-runs)."""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    return index in [i["name"] for i in insp.get_indexes(table)]
+
+
+def upgrade() -> None:
+    if _primary_key_columns("planner_course") != ["user_id", "id"]:
+        op.execute(
+            "ALTER TABLE planner_course DROP PRIMARY KEY, ADD PRIMARY KEY (user_id, id)"
+        )
+    if _index_exists("planner_course", "ix_planner_course_user_id"):
+        op.drop_index("ix_planner_course_user_id", table_name="planner_course")
+
+
+def downgrade() -> None:
+    op.create_index("ix_planner_course_user_id", "planner_course", ["user_id"])
+    op.execute("ALTER TABLE planner_course DROP PRIMARY KEY, ADD PRIMARY KEY (id)")
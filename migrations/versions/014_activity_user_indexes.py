@@ -0,0 +1,52 @@
+"""add composite user indexes to the schedule activity table
+
+GET /schedule/activities filters on user_id, year and week, and the
+series endpoints filter on user_id and series_id. Before this, both could
+only use the single-column FK index on user_id or the index on series_id.
+ix_activity_user_year_week_day serves the week view through its
+(user_id, year, week) prefix, so no separate (user_id, week, year) index
+is added. The series_id index is replaced by ix_activity_user_series.
+
+Revision ID: 014_activity_user_indexes
+Revises: 013_planner_course_user_pk
+Create Date: 2026-10-14
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import inspect
+
+revision: str = '014_activity_user_indexes'
+down_revision: Union[str, Sequence[str], None] = '013_planner_course_user_pk'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _index_exists(table: str, index: str) -> bool:
+    """Check if an index already exists (safe for re-runs)."""
+    conn = op.get_bind()
+    insp = inspect(conn)
+    return index in [i["name"] for i in insp.get_indexes(table)]
+
+
+def upgrade() -> None:
+    if not _index_exists("activity", "ix_activity_user_year_week_day"):
+        op.create_index(
+            "ix_activity_user_year_week_day",
+            "activity",
+            ["user_id", "year", "week", "day"],
+        )
+    if not _index_exists("activity", "ix_activity_user_series"):
+        op.create_index(
+            "ix_activity_user_series",
+            "activity",
+            ["user_id", "series_id"],
+        )
+    if _index_exists("activity", "ix_activity_series_id"):
+        op.drop_index("ix_activity_series_id", table_name="activity")
+
+
+def downgrade() -> None:
+    op.create_index("ix_activity_series_id", "activity", ["series_id"])
+    op.drop_index("ix_activity_user_series", table_name="activity")
+    op.drop_index("ix_activity_user_year_week_day", table_name="activity")
@@ -5,6 +5,10 @@ import uuid
 
 class CalendarEvent(db.Model):
     __tablename__ = 'calendar_events'
+    # get_events filtrerar på user_id + start_time-intervall och sorterar på start_time
+    __table_args__ = (
+        db.Index('ix_calendar_events_user_start', 'user_id', 'start_time'),
+    )
 
     id = db.Column(db.String(100), primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -25,6 +29,10 @@ class CalendarEvent(db.Model):
 
 class DayNote(db.Model):
     __tablename__ = 'day_notes'
+    # En anteckning per användare och dag; krävs för upsert i save_day_note
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'date', name='uq_day_notes_user_date'),
+    )
 
     id = db.Column(db.String(100), primary_key=True)
     date = db.Column(db.Date, nullable=False)
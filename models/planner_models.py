@@ -2,13 +2,23 @@ from datetime import datetime
 from services.db_config import db
 import uuid
 
+# Planner-tabellerna har inga relationer; eventuella framtida relationship()
+# ska deklareras med lazy="raise" så att N+1-laddningar i list-endpoints
+# upptäcks direkt i stället för att tyst ge en SELECT per rad.
+
 class PlannerActivity(db.Model):
     __tablename__ = "planner_activity"
+    __table_args__ = (
+        # Alla läsningar filtrerar på deleted_at IS NULL; MySQL saknar partiella
+        # index, så deleted_at ligger sist och de aktiva raderna blir ett intervall.
+        db.Index("ix_planner_activity_active", "user_id", "archive_name", "deleted_at"),
+    )
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     # user_id har här ändrats till en vanlig String(36) utan ForeignKey för att undvika
     # OperationalError 3780 vid inkompatibla tabellinställningar i MySQL.
-    user_id = db.Column(db.String(36), nullable=False, index=True)
+    # Inget eget index: user_id är prefix i ix_planner_activity_active.
+    user_id = db.Column(db.String(36), nullable=False)
     title = db.Column(db.String(150), nullable=False)
     teacher = db.Column(db.String(150), nullable=True)
     room = db.Column(db.String(150), nullable=True)
@@ -25,9 +35,15 @@ class PlannerActivity(db.Model):
 
 class PlannerCourse(db.Model):
     __tablename__ = "planner_course"
+    __table_args__ = (
+        # Kurs-ID:n är klientgenererade och unika per användare, inte globalt:
+        # med user_id först i nyckeln kan en användare aldrig krocka med (eller
+        # skriva över) någon annans kurs, och nyckeln täcker WHERE user_id = ?.
+        db.PrimaryKeyConstraint("user_id", "id", name="pk_planner_course"),
+    )
 
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = db.Column(db.String(36), nullable=False, index=True)
+    id = db.Column(db.String(36), nullable=False, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.String(36), nullable=False)
     title = db.Column(db.String(150), nullable=False)
     teacher = db.Column(db.String(150), nullable=True)
     room = db.Column(db.String(150), nullable=True)
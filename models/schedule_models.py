@@ -42,10 +42,17 @@ class FamilyMember(db.Model):
 
 class Activity(db.Model):
     __tablename__ = "activity"
-    __table_args__ = {"mysql_charset": "utf8mb4", "mysql_collate": "utf8mb4_unicode_ci"}
+    __table_args__ = (
+        # Veckovyn filtrerar på user_id + year + week; day sist gör att samma
+        # index även täcker uppslag per dag
+        db.Index("ix_activity_user_year_week_day", "user_id", "year", "week", "day"),
+        # Serievägarna filtrerar alltid på både serie och ägare
+        db.Index("ix_activity_user_series", "user_id", "series_id"),
+        {"mysql_charset": "utf8mb4", "mysql_collate": "utf8mb4_unicode_ci"},
+    )
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False)
-    series_id = db.Column(db.String(36), nullable=True, index=True)
+    series_id = db.Column(db.String(36), nullable=True)
     name = db.Column(db.String(150), nullable=False)
     icon = db.Column(db.String(10), nullable=False)
     day = db.Column(db.String(20), nullable=False)
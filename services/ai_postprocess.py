@@ -2,11 +2,14 @@
 from __future__ import annotations
 
 from datetime import date, datetime
+from functools import lru_cache
 import os
 from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
 
 from dateutil import parser as date_parser
 
+from services.dates import parse_iso_day
+
 SWEDISH_DAYS: List[str] = [
     "Måndag",
     "Tisdag",
@@ -74,13 +77,33 @@ def _parse_date(value: Any) -> date:
     return parsed.date()
 
 
-def _date_components(value: Any) -> Tuple[str, int, int]:
-    d = _parse_date(value)
+def _components(d: date) -> Tuple[str, int, int]:
     iso = d.isocalendar()
     day_name = SWEDISH_DAYS[iso.weekday - 1]
     return day_name, iso.week, iso.year
 
 
+@lru_cache(maxsize=4096)
+def _iso_day_components(value: str) -> Optional[Tuple[str, int, int]]:
+    # Exakt YYYY-MM-DD (det modellen nästan alltid svarar med) skivas för hand
+    # i stället för isoparse, och samma datum återkommer ofta i en import.
+    # Bara den formen cachas: dateutils fallback fyller i saknade delar från
+    # dagens datum och får därför inte leva kvar i cachen över dygnsskiften.
+    d = parse_iso_day(value)
+    return None if d is None else _components(d)
+
+
+def _date_components(value: Any) -> Tuple[str, int, int]:
+    if isinstance(value, str):
+        try:
+            components = _iso_day_components(value)
+        except ValueError:
+            components = None  # t.ex. 2025-02-30: låt den vanliga parsningen avgöra
+        if components is not None:
+            return components
+    return _components(_parse_date(value))
+
+
 def _normalize_day_label(day: Any) -> Optional[str]:
     if not isinstance(day, str):
         return None
@@ -0,0 +1,40 @@
+"""WSGI-genväg för CORS-preflight (OPTIONS) från tillåtna origins."""
+
+
+class CorsPreflightMiddleware:
+    """Answer CORS preflights for allowed origins before Flask builds a request.
+
+    Only OPTIONS requests that carry Access-Control-Request-Method, target
+    ``path_prefix`` and come from one of ``origins`` are answered here, with
+    the same headers Flask-Cors plus ``mirror_requested_cors_headers`` would
+    send. Everything else, including preflights from unknown origins, is
+    passed through to the wrapped app unchanged.
+    """
+
+    def __init__(self, app, origins, methods, path_prefix="/api/", max_age=600):
+        self.app = app
+        self.origins = frozenset(origins)
+        self.path_prefix = path_prefix
+        self._static_headers = [
+            ("Access-Control-Allow-Credentials", "true"),
+            ("Access-Control-Allow-Methods", ", ".join(methods)),
+            ("Access-Control-Max-Age", str(max_age)),
+            ("Vary", "Origin, Access-Control-Request-Headers"),
+            ("Content-Length", "0"),
+        ]
+
+    def __call__(self, environ, start_response):
+        if (
+            environ.get("REQUEST_METHOD") == "OPTIONS"
+            and "HTTP_ACCESS_CONTROL_REQUEST_METHOD" in environ
+            and environ.get("HTTP_ORIGIN") in self.origins
+            and environ.get("PATH_INFO", "").startswith(self.path_prefix)
+        ):
+            headers = [("Access-Control-Allow-Origin", environ["HTTP_ORIGIN"])]
+            headers.extend(self._static_headers)
+            requested = environ.get("HTTP_ACCESS_CONTROL_REQUEST_HEADERS")
+            if requested:
+                headers.append(("Access-Control-Allow-Headers", requested))
+            start_response("204 No Content", headers)
+            return [b""]
+        return self.app(environ, start_response)
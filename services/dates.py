@@ -0,0 +1,23 @@
+"""Snabb datumparsning för import- och schemavägarna."""
+from datetime import date
+from typing import Optional
+
+
+def parse_iso_day(value: str) -> Optional[date]:
+    """Parsa exakt 'YYYY-MM-DD' genom skivning; None om strängen har en annan form.
+
+    Betydligt snabbare än strptime/isoparse för den form som nästan alla
+    klienter skickar. Ett ogiltigt datum i rätt form (t.ex. 2025-02-30) ger
+    ValueError som från date().
+    """
+    if (
+        len(value) == 10
+        and value[4] == "-"
+        and value[7] == "-"
+        and value.isascii()
+        and value[:4].isdigit()
+        and value[5:7].isdigit()
+        and value[8:].isdigit()
+    ):
+        return date(int(value[:4]), int(value[5:7]), int(value[8:]))
+    return None
@@ -1,34 +1,55 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from sqlalchemy import event
-from sqlalchemy.engine import Engine
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 import logging
+import os
 
 # Set up logging
 logging.basicConfig()
-logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
+# SQL-loggning av varje sats är dyr i produktion; slå på vid felsökning
+if os.environ.get('SQLALCHEMY_LOG_STATEMENTS'):
+    logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
 
+# Sessionen är redan scopad per app-kontext av Flask-SQLAlchemy och tas bort
+# vid teardown. Anslutningar kontrolleras av pool_pre_ping vid checkout (se
+# DATABASE_POOL_OPTIONS), så ingen egen ping-lyssnare per connect behövs.
 db = SQLAlchemy()
 
-# Add ping function to keep connection alive
-@event.listens_for(Engine, "engine_connect")
-def ping_connection(connection, branch):
-    if branch:
-        return
+def upsert(model, values, index_elements, update_columns):
+    """Build a single-statement INSERT-or-UPDATE for the session's dialect.
 
-    try:
-        connection.scalar("SELECT 1")
-    except Exception:
-        raw_conn = getattr(connection.connection, "connection", None)
-        if raw_conn is not None and hasattr(raw_conn, "ping"):
-            raw_conn.ping()
+    MySQL gets INSERT ... ON DUPLICATE KEY UPDATE, SQLite/Postgres get
+    INSERT ... ON CONFLICT (index_elements) DO UPDATE. ``index_elements`` must
+    match a unique constraint; ``update_columns`` are taken from the new row.
+    """
+    dialect = db.session.get_bind().dialect.name
+    table = model.__table__
+    if dialect == "mysql":
+        stmt = mysql.insert(table).values(values)
+        return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in update_columns})
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(table).values(values)
+        return stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={c: stmt.excluded[c] for c in update_columns},
+        )
+    raise RuntimeError(f"upsert not supported for dialect {dialect}")
 
 class DriveFile(db.Model):
     __tablename__ = 'drive_files'
+    # Alla notes-frågor filtrerar på user_id + file_path (= eller LIKE 'prefix/%')
+    __table_args__ = (
+        db.Index('ix_drive_files_user_path', 'user_id', 'file_path'),
+        db.Index('ix_drive_files_user_parent', 'user_id', 'parent_path'),
+    )
 
     id = db.Column(db.String(100), primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(500), nullable=False)
+    # Föräldrakatalogens file_path, så att en kataloglistning blir en
+    # likhetsfråga. Notes: '/' för rotnivån; Drive-synk: '' för toppnivån.
+    parent_path = db.Column(db.String(500), nullable=True)
     url = db.Column(db.String(500))
     tags = db.Column(db.String(500))
     notebooklm = db.Column(db.String(500))
@@ -40,6 +61,10 @@ class DriveFile(db.Model):
 
 class NoteContent(db.Model):
     __tablename__ = 'note_contents'
+    # Ett innehåll per fil; krävs för upsert i save_note/get_note
+    __table_args__ = (
+        db.UniqueConstraint('file_id', name='uq_note_contents_file_id'),
+    )
 
     id = db.Column(db.String(100), primary_key=True)
     file_id = db.Column(db.String(100), db.ForeignKey('drive_files.id', ondelete='CASCADE'), nullable=False)
@@ -0,0 +1,97 @@
+"""Retry-dekorator för routes som kan drabbas av tappade MySQL-anslutningar."""
+import logging
+import random
+import threading
+from functools import wraps
+from time import sleep
+
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from services.db_config import db
+
+logger = logging.getLogger(__name__)
+
+_ATTEMPTS = 4
+_BACKOFF_BASE = 0.1
+
+# En endpoint som nästan alltid lyckas på första försöket får bara ett omförsök:
+# ett enstaka fel där är en död anslutning som rollback + pre_ping redan har
+# bytt ut, och fler försök skulle bara förlänga en verklig driftstörning.
+_HEALTHY_ATTEMPTS = 2
+_HEALTHY_MIN_CALLS = 100
+_HEALTHY_SUCCESS_RATE = 0.99
+# Räknarna halveras här så att kvoten speglar senare anrop, inte hela livstiden
+_STATS_WINDOW = 10_000
+
+_stats = threading.local()
+
+
+def _backoff(attempt: int) -> float:
+    """Exponentiell backoff med "full jitter": slumpad väntan i [0, base * 2**attempt].
+
+    Samtidiga requests som träffar samma anslutningsblipp sprids ut i stället
+    för att alla försöka igen i samma ögonblick. Med fyra försök blir längsta
+    väntan 0,4 s, så inget tak behövs.
+    """
+    return random.uniform(0, _BACKOFF_BASE * 2 ** attempt)
+
+
+def _is_retryable(e: DBAPIError) -> bool:
+    # OperationalError täcker "server has gone away" m.fl.; andra DBAPI-fel
+    # görs bara om när SQLAlchemy själv har märkt anslutningen som ogiltig
+    return isinstance(e, OperationalError) or e.connection_invalidated
+
+
+def _endpoint_stats(func) -> list:
+    """[anrop, anrop vars första försök gav anslutningsfel] för func i denna tråd."""
+    counts = getattr(_stats, "counts", None)
+    if counts is None:
+        counts = _stats.counts = {}
+    return counts.setdefault(func, [0, 0])
+
+
+def _attempts_for(stats: list) -> int:
+    calls, failures = stats
+    if calls >= _HEALTHY_MIN_CALLS and failures <= calls * (1 - _HEALTHY_SUCCESS_RATE):
+        return _HEALTHY_ATTEMPTS
+    return _ATTEMPTS
+
+
+def _record(stats: list, failed: bool) -> None:
+    stats[0] += 1
+    stats[1] += failed
+    if stats[0] >= _STATS_WINDOW:
+        stats[0] //= 2
+        stats[1] //= 2
+
+
+def retry_on_connection_error(func):
+    """Gör om routen vid tappad anslutning, max fyra försök (två för friska endpoints).
+
+    Bara för läsande (GET-)routes: en skrivning vars commit gick igenom men
+    vars svar tappades skulle annars köras två gånger (t.ex. dubbla rader från
+    en import), så skrivande routes ska inte dekoreras. pool_pre_ping byter
+    redan ut döda anslutningar innan första frågan, så retry behövs sällan.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = _endpoint_stats(func)
+        attempts = _attempts_for(stats)
+        for attempt in range(attempts):
+            try:
+                result = func(*args, **kwargs)
+            except DBAPIError as e:
+                if not _is_retryable(e):
+                    raise
+                if attempt == 0:
+                    _record(stats, True)
+                logger.warning("DB connection error (attempt %s/%s): %s", attempt + 1, attempts, e)
+                db.session.rollback()
+                if attempt < attempts - 1:
+                    sleep(_backoff(attempt))
+                    continue
+                raise
+            if attempt == 0:
+                _record(stats, False)
+            return result
+    return wrapper
@@ -196,6 +196,7 @@ def save_to_database(items, user_id, parent_path=''):
                     id=item['id'],
                     name=item['name'],
                     file_path=current_path,
+                    parent_path=parent_path,
                     url=item.get('webViewLink'),
                     tags=','.join(item.get('tags', [])),
                     notebooklm=item.get('NotebookLM'),
@@ -276,6 +277,7 @@ def save_to_database_with_session(items, user_id, session, parent_path=''):
                     id=item['id'],
                     name=item['name'],
                     file_path=current_path,
+                    parent_path=parent_path,
                     url=item.get('webViewLink'),
                     tags=','.join(item.get('tags', [])),
                     notebooklm=item.get('NotebookLM'),
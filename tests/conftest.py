@@ -0,0 +1,35 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db_config import db
+
+
+@pytest.fixture
+def record_statements():
+    """Context manager recording every SQL statement run on an app's engine.
+
+    Usage: ``with record_statements(app) as statements: ...``; filter the
+    list afterwards for the statements a test cares about.
+    """
+    @contextmanager
+    def _record(app):
+        statements = []
+        with app.app_context():
+            engine = db.engine
+
+        def _before(conn, cursor, statement, params, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, 'before_cursor_execute', _before)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', _before)
+    return _record
+
@@ -221,3 +221,11 @@ def test_extract_first_json_blob_ignores_braces_inside_strings():
     text = '[{"name": "A", "note": "Use {curly} and [square]"}]'
     blob = _extract_first_json_blob(text)
     assert blob == text
+
+
+def test_date_components_fast_path_matches_dateutil():
+    for value in ('2024-12-30', '2025-01-05', '2025-03-17', '2020-02-29'):
+        expected = ai_postprocess._components(ai_postprocess._parse_date(value))
+        assert ai_postprocess._date_components(value) == expected
+    with pytest.raises(ValueError):
+        ai_postprocess._date_components('2025-02-30')
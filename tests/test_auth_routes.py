@@ -0,0 +1,113 @@
+import os
+import sys
+import jwt
+import pytest
+from flask import Flask
+from sqlalchemy.pool import StaticPool
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db_config import db
+from api.auth_routes import auth, _TOKEN_CACHE, _USER_CACHE, _issue_token, _jwt
+from models.user import User
+import models.calendar  # noqa: F401
+from config.settings import SECRET_KEY
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'poolclass': StaticPool,
+        'connect_args': {'check_same_thread': False},
+    }
+    app.config['SECRET_KEY'] = SECRET_KEY
+    db.init_app(app)
+    app.register_blueprint(auth, url_prefix='/api/auth')
+
+    with app.app_context():
+        db.create_all()
+        user = User(id=User.generate_id(), username='tester')
+        user.set_password('pw')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        token = jwt.encode({'user_id': user_id}, SECRET_KEY, algorithm='HS256')
+    _USER_CACHE.clear()
+    test_client = app.test_client()
+    test_client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    yield test_client, app, user_id
+    _USER_CACHE.clear()
+
+
+def test_me_reuses_cached_user(client, record_statements):
+    c, app, user_id = client
+    res = c.get('/api/auth/me')
+    assert res.status_code == 200
+    assert res.get_json()['data']['id'] == user_id
+
+    with record_statements(app) as statements:
+        res = c.get('/api/auth/me')
+    assert res.status_code == 200
+    assert res.get_json()['data']['username'] == 'tester'
+    assert [s for s in statements if 'FROM users' in s] == []
+
+
+def test_user_change_evicts_cached_user(client):
+    c, app, user_id = client
+    assert c.get('/api/auth/me').get_json()['data']['email'] is None
+    with app.app_context():
+        db.session.get(User, user_id).email = 'ny@example.com'
+        db.session.commit()
+    assert c.get('/api/auth/me').get_json()['data']['email'] == 'ny@example.com'
+
+
+def test_invalid_token_rejected(client):
+    c, app, user_id = client
+    res = c.get('/api/auth/me', headers={'Authorization': 'Bearer nope'})
+    assert res.status_code == 401
+
+
+def test_expired_token_not_served_from_cache(client):
+    c, app, user_id = client
+    token = jwt.encode({'user_id': user_id, 'exp': 1}, SECRET_KEY, algorithm='HS256')
+    res = c.get('/api/auth/me', headers={'Authorization': f'Bearer {token}'})
+    assert res.status_code == 401
+    assert _TOKEN_CACHE.get(token) is None
+
+
+def test_login_records_last_login_after_response(client):
+    c, app, user_id = client
+    res = c.post('/api/auth/login', json={'username': 'tester', 'password': 'pw'})
+    assert res.status_code == 200
+    returned = res.get_json()['data']['user']['last_login']
+    assert returned is not None
+    res.close()
+    with app.app_context():
+        assert db.session.get(User, user_id).last_login.isoformat() == returned
+
+
+def test_repeated_login_skips_last_login_write(client):
+    c, app, user_id = client
+    first = c.post('/api/auth/login', json={'username': 'tester', 'password': 'pw'})
+    first.close()
+    second = c.post('/api/auth/login', json={'username': 'tester', 'password': 'pw'})
+    second.close()
+    assert second.status_code == 200
+    assert second.get_json()['data']['user']['last_login'] == first.get_json()['data']['user']['last_login']
+
+
+def test_issued_token_roundtrips_with_stock_pyjwt(client):
+    # _OrjsonJWT bygger på PyJWT-internals (se pinningen i requirements.txt);
+    # tokens måste vara utbytbara med vanliga jwt.encode/jwt.decode
+    c, app, user_id = client
+    with app.app_context():
+        token = _issue_token(db.session.get(User, user_id))
+    claims = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+    assert claims['user_id'] == user_id and claims['username'] == 'tester'
+    assert claims['exp'] > 0
+
+    stock = jwt.encode({'user_id': user_id, 'exp': claims['exp']}, SECRET_KEY, algorithm='HS256')
+    assert _jwt.decode(stock, SECRET_KEY, algorithms=['HS256'])['user_id'] == user_id
@@ -0,0 +1,123 @@
+import os
+import sys
+import jwt
+import pytest
+from datetime import datetime
+from flask import Flask
+from sqlalchemy.pool import StaticPool
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db_config import db
+import api.calendar_routes as calendar_routes
+from api.calendar_routes import calendar_api
+from models.user import User
+from models.calendar import CalendarEvent
+from config.settings import SECRET_KEY
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'poolclass': StaticPool,
+        'connect_args': {'check_same_thread': False},
+    }
+    app.config['SECRET_KEY'] = SECRET_KEY
+    db.init_app(app)
+    app.register_blueprint(calendar_api, url_prefix='/api')
+
+    with app.app_context():
+        db.create_all()
+        user = User(id=User.generate_id(), username='tester')
+        user.set_password('pw')
+        other = User(id=User.generate_id(), username='other')
+        other.set_password('pw')
+        db.session.add_all([user, other])
+        db.session.commit()
+        token = jwt.encode({'user_id': user.id}, SECRET_KEY, algorithm='HS256')
+        other_id = other.id
+    test_client = app.test_client()
+    test_client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    yield test_client, app, other_id
+
+
+def test_event_crud_roundtrip(client):
+    c, app, _ = client
+    res = c.post('/api/events', json={'title': 'Möte', 'start': 1700000000000, 'end': 1700003600000})
+    assert res.status_code == 201
+    event = res.get_json()['data']
+    assert event['start'] == 1700000000000
+    assert event['end'] == 1700003600000
+
+    res = c.get('/api/events', query_string={'start': 1699990000000, 'end': 1700010000000})
+    assert res.status_code == 200
+    assert [e['id'] for e in res.get_json()['data']] == [event['id']]
+
+    res = c.put(f"/api/events/{event['id']}", json={'title': 'Nytt möte'})
+    assert res.status_code == 200
+    assert res.get_json()['data']['title'] == 'Nytt möte'
+
+    res = c.delete(f"/api/events/{event['id']}")
+    assert res.status_code == 204
+    assert res.data == b''
+    assert c.get('/api/events').get_json()['data'] == []
+
+
+def test_get_events_streams_in_batches(client, monkeypatch):
+    c, app, _ = client
+    monkeypatch.setattr(calendar_routes, '_EVENT_BATCH_SIZE', 2)
+    starts = [1700000000000 + i * 3600000 for i in range(5)]
+    for start in reversed(starts):
+        c.post('/api/events', json={'title': 't', 'start': start, 'end': start + 1000})
+    res = c.get('/api/events')
+    assert res.status_code == 200
+    body = res.get_json()
+    assert body['success'] is True and body['error'] is None
+    assert [e['start'] for e in body['data']] == starts
+
+
+def test_event_of_other_user_is_not_found(client):
+    c, app, other_id = client
+    with app.app_context():
+        foreign = CalendarEvent(
+            id=CalendarEvent.generate_id(),
+            title='Inte min',
+            start_time=datetime(2024, 1, 1, 10),
+            end_time=datetime(2024, 1, 1, 11),
+            user_id=other_id,
+        )
+        db.session.add(foreign)
+        db.session.commit()
+        foreign_id = foreign.id
+
+    assert c.put(f'/api/events/{foreign_id}', json={'title': 'x'}).status_code == 404
+    assert c.delete(f'/api/events/{foreign_id}').status_code == 404
+
+
+def test_get_events_rejects_invalid_range(client):
+    c, app, _ = client
+    assert c.get('/api/events', query_string={'start': 'abc'}).status_code == 400
+    assert c.get('/api/events', query_string={'start': '--5'}).status_code == 400
+    assert c.get('/api/events', query_string={'end': '9' * 20}).status_code == 400
+    assert c.get('/api/events', query_string={'start': 2000, 'end': 1000}).status_code == 400
+
+
+def test_day_note_upsert(client):
+    c, app, _ = client
+    assert c.get('/api/notes/2024-05-01').get_json()['data']['notes'] == ''
+    first = c.put('/api/notes/2024-05-01', json={'notes': 'a'}).get_json()['data']
+    second = c.put('/api/notes/2024-05-01', json={'notes': 'b'}).get_json()['data']
+    assert first['id'] == second['id']
+    assert c.get('/api/notes/2024-05-01').get_json()['data']['notes'] == 'b'
+
+
+def test_day_note_upsert_returns_id_in_one_statement(client, record_statements):
+    c, app, _ = client
+    first = c.put('/api/notes/2024-05-02', json={'notes': 'a'}).get_json()['data']
+    with record_statements(app) as statements:
+        second = c.put('/api/notes/2024-05-02', json={'notes': 'b'}).get_json()['data']
+    assert second['id'] == first['id']
+    assert not [s for s in statements if 'FROM day_notes' in s]
@@ -0,0 +1,44 @@
+import os
+import sys
+from flask import Flask
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.cors_preflight import CorsPreflightMiddleware
+
+ORIGIN = 'https://app.example.com'
+
+
+def _client():
+    app = Flask(__name__)
+
+    @app.route('/api/things', methods=['GET', 'OPTIONS'])
+    def things():
+        return 'from-flask'
+
+    app.wsgi_app = CorsPreflightMiddleware(app.wsgi_app, [ORIGIN], ['GET', 'POST'], max_age=600)
+    return app.test_client()
+
+
+def test_preflight_from_allowed_origin_is_answered_directly():
+    res = _client().options('/api/things', headers={
+        'Origin': ORIGIN,
+        'Access-Control-Request-Method': 'POST',
+        'Access-Control-Request-Headers': 'authorization, content-type',
+    })
+    assert res.status_code == 204
+    assert res.data == b''
+    assert res.headers['Access-Control-Allow-Origin'] == ORIGIN
+    assert res.headers['Access-Control-Allow-Credentials'] == 'true'
+    assert res.headers['Access-Control-Allow-Methods'] == 'GET, POST'
+    assert res.headers['Access-Control-Allow-Headers'] == 'authorization, content-type'
+    assert res.headers['Access-Control-Max-Age'] == '600'
+
+
+def test_other_requests_reach_the_app():
+    c = _client()
+    unknown = c.options('/api/things', headers={'Origin': 'https://evil.example', 'Access-Control-Request-Method': 'GET'})
+    assert 'Access-Control-Allow-Origin' not in unknown.headers
+    plain_options = c.options('/api/things', headers={'Origin': ORIGIN})
+    assert plain_options.status_code == 200
+    assert c.get('/api/things').data == b'from-flask'
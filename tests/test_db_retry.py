@@ -0,0 +1,102 @@
+import os
+import sys
+import pytest
+from flask import Flask
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db_config import db
+import services.db_retry as db_retry
+
+
+@pytest.fixture
+def app(monkeypatch):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    sleeps = []
+    monkeypatch.setattr(db_retry, 'sleep', sleeps.append)
+    with app.app_context():
+        yield sleeps
+
+
+def _flaky(failures, error=None):
+    calls = []
+
+    @db_retry.retry_on_connection_error
+    def route():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error or OperationalError('SELECT 1', {}, Exception('gone away'))
+        return 'ok'
+    return route, calls
+
+
+def test_retries_with_jittered_exponential_backoff(app):
+    route, calls = _flaky(3)
+    assert route() == 'ok'
+    assert len(calls) == 4
+    assert len(app) == 3
+    for attempt, slept in enumerate(app):
+        assert 0 <= slept <= db_retry._BACKOFF_BASE * 2 ** attempt
+
+
+def test_gives_up_after_last_attempt(app):
+    route, calls = _flaky(10)
+    with pytest.raises(OperationalError):
+        route()
+    assert len(calls) == 4
+
+
+def test_retries_invalidated_dbapi_error_only(app):
+    invalidated = DBAPIError('SELECT 1', {}, Exception('reset'), connection_invalidated=True)
+    route, calls = _flaky(1, invalidated)
+    assert route() == 'ok'
+    assert len(calls) == 2
+
+    route, calls = _flaky(1, DBAPIError('SELECT 1', {}, Exception('bad sql')))
+    with pytest.raises(DBAPIError):
+        route()
+    assert len(calls) == 1
+
+
+def test_healthy_endpoint_gets_a_single_retry(app):
+    calls = []
+    failing = [False]
+
+    @db_retry.retry_on_connection_error
+    def route():
+        calls.append(1)
+        if failing[0]:
+            raise OperationalError('SELECT 1', {}, Exception('gone away'))
+        return 'ok'
+
+    for _ in range(db_retry._HEALTHY_MIN_CALLS):
+        route()
+    calls.clear()
+    failing[0] = True
+    with pytest.raises(OperationalError):
+        route()
+    assert len(calls) == db_retry._HEALTHY_ATTEMPTS
+
+
+def test_only_read_routes_are_retried():
+    # Ett omförsök av en skrivning vars commit redan gått igenom ger dubbletter
+    from api.command_center_routes import command_center_api
+    from api.planner_routes import planner_api
+    from api.schedule_routes import schedule_bp
+    from api.workspace_routes import workspace_api
+
+    retry_code = db_retry.retry_on_connection_error(lambda: None).__code__
+    app = Flask(__name__)
+    for bp in (command_center_api, planner_api, schedule_bp, workspace_api):
+        app.register_blueprint(bp, url_prefix=f'/{bp.name}')
+    for rule in app.url_map.iter_rules():
+        view = app.view_functions[rule.endpoint]
+        retried = False
+        while view is not None:
+            retried = retried or view.__code__ is retry_code
+            view = getattr(view, '__wrapped__', None)
+        if retried:
+            assert rule.methods - {'HEAD', 'OPTIONS'} == {'GET'}, rule.rule
@@ -0,0 +1,125 @@
+import os
+import sys
+import jwt
+import pytest
+from datetime import datetime
+from flask import Flask
+from sqlalchemy.pool import StaticPool
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db_config import db, DriveFile
+import api.routes as routes
+from api.routes import api
+from models.user import User
+import models.calendar  # noqa: F401
+from config.settings import SECRET_KEY
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'poolclass': StaticPool,
+        'connect_args': {'check_same_thread': False},
+    }
+    app.config['SECRET_KEY'] = SECRET_KEY
+    db.init_app(app)
+    app.register_blueprint(api, url_prefix='/api')
+
+    with app.app_context():
+        db.create_all()
+        user = User(id=User.generate_id(), username='tester')
+        user.set_password('pw')
+        db.session.add(user)
+        db.session.commit()
+        token = jwt.encode({'user_id': user.id}, SECRET_KEY, algorithm='HS256')
+        user_id = user.id
+    test_client = app.test_client()
+    test_client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    yield test_client, app, user_id
+
+
+def _add_files(app, user_id, *paths, **fields):
+    with app.app_context():
+        for i, path in enumerate(paths):
+            db.session.add(DriveFile(
+                id=f'{path}-{i}', name=path.rsplit('/', 1)[-1], file_path=path,
+                user_id=user_id, is_folder=False, created_time=datetime(2024, 1, 1), **fields,
+            ))
+        db.session.commit()
+
+
+def test_get_files_groups_by_top_folder_and_subsection(client):
+    c, app, user_id = client
+    _add_files(app, user_id, 'A/a.pdf', 'A/B/b.pdf', '/A/B/C/c.md', 'root.pdf', '/A//d.md', tags='x,y')
+
+    res = c.get('/api/files')
+    assert res.status_code == 200
+    sections = {s['name']: s for s in res.get_json()['data']}
+    assert set(sections) == {'A', 'Uncategorized'}
+
+    a = sections['A']
+    assert a['path'] == '/A'
+    assert sorted(f['file_path'] for f in a['files']) == ['/A//d.md', 'A/a.pdf']
+    assert list(a['subsections']) == ['B']
+    assert a['subsections']['B']['path'] == '/A/B'
+    assert sorted(f['file_path'] for f in a['subsections']['B']['files']) == ['/A/B/C/c.md', 'A/B/b.pdf']
+
+    (root,) = sections['Uncategorized']['files']
+    assert sections['Uncategorized']['path'] == '/'
+    assert root == {
+        'id': 'root.pdf-3', 'name': 'root.pdf', 'url': None, 'tags': ['x', 'y'],
+        'notebooklm': None, 'file_path': 'root.pdf', 'created_time': '2024-01-01T00:00:00',
+    }
+
+
+def test_get_files_search_filters_rows(client):
+    c, app, user_id = client
+    _add_files(app, user_id, 'A/alpha.pdf', 'A/beta.pdf')
+    data = c.get('/api/files', query_string={'search': 'alp'}).get_json()['data']
+    assert [f['name'] for s in data for f in s['files']] == ['alpha.pdf']
+    assert c.get('/api/files', query_string={'search': 'zzz'}).get_json() == {'success': True, 'data': [], 'error': None}
+
+
+def test_get_sections_lists_folders_in_path_order(client):
+    c, app, user_id = client
+    _add_files(app, user_id, 'A/file.pdf')
+    with app.app_context():
+        db.session.add_all([
+            DriveFile(id='f2', name='B', file_path='A/B', user_id=user_id, is_folder=True),
+            DriveFile(id='f1', name='A', file_path='A', user_id=user_id, is_folder=True),
+        ])
+        db.session.commit()
+    data = c.get('/api/sections').get_json()['data']
+    assert data == [{'id': 'f1', 'name': 'A', 'path': 'A'}, {'id': 'f2', 'name': 'B', 'path': 'A/B'}]
+
+
+def test_health_reuses_recent_probe(client, monkeypatch, record_statements):
+    c, app, user_id = client
+    monkeypatch.setattr(routes, '_last_db_ok', 0.0)
+    with record_statements(app) as statements:
+        assert c.get('/api/health').get_json()['data']['database'] == 'connected'
+        assert c.get('/api/health').status_code == 200
+        assert [s.strip() for s in statements].count('SELECT 1') == 1
+        assert c.get('/api/health', query_string={'deep': '1'}).status_code == 200
+    assert [s.strip() for s in statements].count('SELECT 1') == 2
+
+
+def test_update_releases_connection_during_drive_fetch(client, monkeypatch):
+    c, app, user_id = client
+    _add_files(app, user_id, '/note.md')
+    in_transaction = []
+
+    def _fake_tree(service, folder_id):
+        in_transaction.append(db.session().in_transaction())
+        return [{'id': 'd1', 'name': 'Drive.pdf', 'type': 'File', 'webViewLink': 'https://x'}]
+
+    monkeypatch.setattr(routes, 'authenticate_drive_api', lambda: None)
+    monkeypatch.setattr(routes, 'build_folder_tree', _fake_tree)
+    assert c.post('/api/update').status_code == 200
+    assert in_transaction == [False]
+    data = c.get('/api/files').get_json()['data']
+    assert sorted(f['name'] for s in data for f in s['files']) == ['Drive.pdf', 'note.md']
@@ -0,0 +1,110 @@
+import os
+import sys
+import jwt
+import pytest
+from flask import Flask
+from sqlalchemy.pool import StaticPool
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db_config import db, DriveFile, NoteContent
+from api.notes_routes import notes
+from models.user import User
+import models.calendar  # noqa: F401
+from config.settings import SECRET_KEY
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'poolclass': StaticPool,
+        'connect_args': {'check_same_thread': False},
+    }
+    app.config['SECRET_KEY'] = SECRET_KEY
+    db.init_app(app)
+    app.register_blueprint(notes, url_prefix='/api/notes')
+
+    with app.app_context():
+        db.create_all()
+        user = User(id=User.generate_id(), username='tester')
+        user.set_password('pw')
+        db.session.add(user)
+        db.session.commit()
+        token = jwt.encode({'user_id': user.id}, SECRET_KEY, algorithm='HS256')
+    test_client = app.test_client()
+    test_client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    yield test_client, app
+
+
+def _names(res):
+    assert res.status_code == 200
+    return [f['name'] for f in res.get_json()['data']]
+
+
+def test_list_files_returns_direct_children_only(client):
+    c, app = client
+    assert c.post('/api/notes/directory', json={'path': '/a'}).status_code == 200
+    assert c.post('/api/notes/directory', json={'path': '/a/b'}).status_code == 200
+    assert c.post('/api/notes/file', json={'path': '/a/x.md', 'content': 'x', 'tags': ['t1', ' t2 ']}).status_code == 200
+    assert c.post('/api/notes/file', json={'path': '/a/b/y.md', 'content': 'y'}).status_code == 200
+    assert c.post('/api/notes/file', json={'path': '/top.md', 'content': 't'}).status_code == 200
+
+    assert _names(c.get('/api/notes/files')) == ['a', 'top.md']
+    res = c.get('/api/notes/files', query_string={'path': '/a'})
+    assert _names(res) == ['b', 'x.md']
+    assert res.get_json()['data'][1]['tags'] == ['t1', 't2']
+
+
+def test_save_note_updates_existing_content(client):
+    c, app = client
+    first = c.post('/api/notes/file', json={'path': '/n.md', 'content': 'v1'}).get_json()['data']
+    second = c.post('/api/notes/file', json={'path': '/n.md', 'content': 'v2'}).get_json()['data']
+    assert first['id'] == second['id']
+    assert c.get('/api/notes/file', query_string={'path': '/n.md'}).get_json()['data']['content'] == 'v2'
+    with app.app_context():
+        assert NoteContent.query.count() == 1
+
+
+def test_get_note_creates_missing_content(client):
+    c, app = client
+    file_id = c.post('/api/notes/file', json={'path': '/m.md', 'content': 'x'}).get_json()['data']['id']
+    with app.app_context():
+        NoteContent.query.filter_by(file_id=file_id).delete()
+        db.session.commit()
+    assert c.get('/api/notes/file', query_string={'path': '/m.md'}).get_json()['data']['content'] == ''
+    assert c.get('/api/notes/file', query_string={'path': '/m.md'}).get_json()['data']['content'] == ''
+    with app.app_context():
+        assert NoteContent.query.filter_by(file_id=file_id).count() == 1
+
+
+def test_move_and_delete_directory_tree(client):
+    c, app = client
+    c.post('/api/notes/directory', json={'path': '/src'})
+    c.post('/api/notes/directory', json={'path': '/src/sub'})
+    c.post('/api/notes/file', json={'path': '/src/sub/deep.md', 'content': 'd'})
+
+    res = c.post('/api/notes/move', json={'source': '/src', 'destination': '/dst'})
+    assert res.status_code == 200
+    assert [f['file_path'] for f in c.get('/api/notes/files').get_json()['data']] == ['/dst']
+    assert _names(c.get('/api/notes/files', query_string={'path': '/dst/sub'})) == ['deep.md']
+    assert c.get('/api/notes/file', query_string={'path': '/dst/sub/deep.md'}).get_json()['data']['content'] == 'd'
+
+    res = c.delete('/api/notes/file', query_string={'path': '/dst'})
+    assert res.status_code == 204
+    with app.app_context():
+        assert DriveFile.query.count() == 0
+        assert NoteContent.query.count() == 0
+
+
+def test_move_rejects_missing_parent_and_existing_destination(client):
+    c, app = client
+    c.post('/api/notes/file', json={'path': '/a.md', 'content': 'a'})
+    c.post('/api/notes/file', json={'path': '/b.md', 'content': 'b'})
+    assert c.post('/api/notes/move', json={'source': '/nope.md', 'destination': '/c.md'}).status_code == 404
+    assert c.post('/api/notes/move', json={'source': '/a.md', 'destination': '/missing/a.md'}).status_code == 400
+    assert c.post('/api/notes/move', json={'source': '/a.md', 'destination': '/b.md'}).status_code == 400
+    assert c.post('/api/notes/move', json={'source': '/a.md', 'destination': '/c.md'}).status_code == 200
+    assert sorted(f['file_path'] for f in c.get('/api/notes/files').get_json()['data']) == ['/b.md', '/c.md']
@@ -0,0 +1,217 @@
+import os
+import sys
+import jwt
+import uuid
+import pytest
+from flask import Flask
+from sqlalchemy.pool import StaticPool
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db_config import db
+import api.planner_routes as planner_routes
+from api.planner_routes import planner_api
+from models.planner_models import PlannerActivity, PlannerCourse
+from models.user import User
+import models.calendar  # noqa: F401
+from config.settings import SECRET_KEY
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'poolclass': StaticPool,
+        'connect_args': {'check_same_thread': False},
+    }
+    app.config['SECRET_KEY'] = SECRET_KEY
+    db.init_app(app)
+    app.register_blueprint(planner_api, url_prefix='/api/planner')
+
+    with app.app_context():
+        db.create_all()
+        user = User(id=User.generate_id(), username='tester')
+        user.set_password('pw')
+        db.session.add(user)
+        db.session.commit()
+        token = jwt.encode({'user_id': user.id}, SECRET_KEY, algorithm='HS256')
+    test_client = app.test_client()
+    test_client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    yield test_client, app
+
+
+def _activity(**overrides):
+    item = {'title': 'Matte', 'day': 'Måndag', 'startTime': '08:00', 'endTime': '09:30'}
+    item.update(overrides)
+    return item
+
+
+def test_sync_replaces_current_schedule(client):
+    c, app = client
+    res = c.post('/api/planner/activities', json=[_activity(id='a1'), _activity(id='a2', title='Svenska')])
+    assert res.status_code == 201
+    assert res.get_json()['data']['activities'][0]['duration'] == 90
+
+    res = c.post('/api/planner/activities', json=[_activity(id='a1', title='Fysik')])
+    assert res.status_code == 201
+    data = c.get('/api/planner/activities').get_json()['data']
+    assert [(a['id'], a['title']) for a in data] == [('a1', 'Fysik')]
+
+
+def test_sync_keeps_unchanged_rows_and_soft_deletes_missing(client):
+    c, app = client
+    c.post('/api/planner/activities', json=[_activity(id='a1'), _activity(id='a2')])
+    c.post('/api/planner/activities', json=[_activity(id='a1'), _activity(id='a3')])
+    with app.app_context():
+        rows = {a.id: a.deleted_at for a in PlannerActivity.query.all()}
+    assert set(rows) == {'a1', 'a2', 'a3'}
+    assert rows['a1'] is None and rows['a3'] is None and rows['a2'] is not None
+
+    # En soft-deletad rad återupplivas om den kommer tillbaka i payloaden
+    c.post('/api/planner/activities', json=[_activity(id='a2')])
+    assert [a['id'] for a in c.get('/api/planner/activities').get_json()['data']] == ['a2']
+
+
+def test_large_sync_is_upserted_in_pages(client):
+    c, app = client
+    payload = [_activity(id=f'a{i}') for i in range(2500)]
+    res = c.post('/api/planner/activities', json=payload)
+    assert res.status_code == 201
+    assert res.get_json()['data']['count'] == 2500
+    assert len(c.get('/api/planner/activities').get_json()['data']) == 2500
+
+
+def test_sync_does_not_overwrite_other_users_activity(client):
+    c, app = client
+    with app.app_context():
+        db.session.add(PlannerActivity(
+            id='foreign', user_id='someone-else', title='Inte min', day='Måndag',
+            start_time='08:00', end_time='09:00', duration=60,
+        ))
+        db.session.commit()
+    res = c.post('/api/planner/activities', json=[_activity(id='foreign')])
+    assert res.status_code == 400
+    with app.app_context():
+        foreign = db.session.get(PlannerActivity, 'foreign')
+        assert foreign.user_id == 'someone-else' and foreign.title == 'Inte min'
+
+
+def test_sync_upsert_never_rewrites_owner():
+    assert 'user_id' not in planner_routes._ACTIVITY_UPSERT_COLUMNS
+    assert 'user_id' not in planner_routes._COURSE_UPSERT_COLUMNS
+
+
+def test_sync_rejects_duplicate_ids(client):
+    c, app = client
+    c.post('/api/planner/activities', json=[_activity(id='a1')])
+    res = c.post('/api/planner/activities', json=[_activity(id='a2'), _activity(id='a2', title='Svenska')])
+    assert res.status_code == 400
+    assert [a['id'] for a in c.get('/api/planner/activities').get_json()['data']] == ['a1']
+
+    res = c.post('/api/planner/courses/sync', json=[{'id': 'c1', 'title': 'Kemi'}, {'id': ' c1', 'title': 'Fysik'}])
+    assert res.status_code == 400
+    assert c.get('/api/planner/courses').get_json()['data'] == []
+
+
+def test_get_activities_streams_in_batches(client, monkeypatch):
+    c, app = client
+    monkeypatch.setattr(planner_routes, '_ACTIVITY_BATCH_SIZE', 2)
+    c.post('/api/planner/activities', json=[_activity(id=f'a{i}') for i in range(5)])
+    res = c.get('/api/planner/activities')
+    assert res.status_code == 200
+    body = res.get_json()
+    assert body['success'] is True and body['error'] is None
+    assert sorted(a['id'] for a in body['data']) == [f'a{i}' for i in range(5)]
+
+
+def test_archives_are_listed_separately(client):
+    c, app = client
+    c.post('/api/planner/activities', json=[_activity()])
+    res = c.post('/api/planner/activities', json={'archiveName': 'VT24', 'activities': [_activity(title='Arkiv')]})
+    assert res.status_code == 201
+
+    assert c.get('/api/planner/archives').get_json()['data'] == ['VT24']
+    archived = c.get('/api/planner/activities', query_string={'archive_name': 'VT24'}).get_json()['data']
+    assert [a['title'] for a in archived] == ['Arkiv']
+    assert [a['title'] for a in c.get('/api/planner/activities').get_json()['data']] == ['Matte']
+
+    assert c.delete('/api/planner/activities', query_string={'archive_name': 'VT24'}).status_code == 204
+    assert c.get('/api/planner/archives').get_json()['data'] == []
+
+
+def test_archive_sync_generates_distinct_uuid4_ids(client):
+    c, app = client
+    res = c.post('/api/planner/activities', json={'archiveName': 'HT24', 'activities': [_activity(id='x')] * 3})
+    ids = [a['id'] for a in res.get_json()['data']['activities']]
+    assert len(set(ids)) == 3 and 'x' not in ids
+    assert all(str(uuid.UUID(i)) == i and uuid.UUID(i).version == 4 for i in ids)
+
+
+def test_sync_rejects_invalid_time(client):
+    c, app = client
+    res = c.post('/api/planner/activities', json=[_activity(startTime='8:00')])
+    assert res.status_code == 400
+    assert c.post('/api/planner/activities', json=['not-an-object']).status_code == 400
+    assert c.post('/api/planner/activities', data='{not json', content_type='application/json').status_code == 400
+    assert c.post('/api/planner/activities', json=[_activity(title=5)]).status_code == 400
+
+
+def test_courses_sync_roundtrip(client):
+    c, app = client
+    res = c.post('/api/planner/courses/sync', json={'courses': [{'id': 'c1', 'title': 'Kemi', 'duration': 45}]})
+    assert res.status_code == 201
+    assert c.post('/api/planner/courses/sync', json=[{'title': ''}]).status_code == 400
+    assert c.post('/api/planner/courses/sync', json=['x']).status_code == 400
+    courses = c.get('/api/planner/courses').get_json()['data']
+    assert courses == [{'id': 'c1', 'title': 'Kemi', 'teacher': '', 'room': '', 'duration': 45, 'color': None, 'category': None}]
+
+
+def test_courses_sync_updates_and_removes_in_place(client):
+    c, app = client
+    c.post('/api/planner/courses/sync', json=[{'id': 'c1', 'title': 'Kemi'}, {'id': 'c2', 'title': 'Fysik'}])
+    res = c.post('/api/planner/courses/sync', json=[{'id': 'c1', 'title': 'Kemi B', 'room': 'A1'}, {'title': 'Ny'}])
+    assert res.status_code == 201
+    courses = {co['title']: co for co in c.get('/api/planner/courses').get_json()['data']}
+    assert set(courses) == {'Kemi B', 'Ny'}
+    assert courses['Kemi B']['id'] == 'c1' and courses['Kemi B']['room'] == 'A1'
+    assert c.post('/api/planner/courses/sync', json=[]).status_code == 201
+    assert c.get('/api/planner/courses').get_json()['data'] == []
+
+
+def test_courses_sync_keeps_other_users_course_with_same_id(client):
+    c, app = client
+    with app.app_context():
+        other = User(id=User.generate_id(), username='other')
+        other.set_password('pw')
+        db.session.add(other)
+        db.session.add(PlannerCourse(id='shared', user_id=other.id, title='Deras'))
+        db.session.commit()
+        other_id = other.id
+    res = c.post('/api/planner/courses/sync', json=[{'id': ' shared ', 'title': 'Min'}])
+    assert res.status_code == 201
+    assert [co['title'] for co in c.get('/api/planner/courses').get_json()['data']] == ['Min']
+    with app.app_context():
+        assert db.session.get(PlannerCourse, (other_id, 'shared')).title == 'Deras'
+
+
+def test_delete_endpoints_return_no_content(client):
+    c, app = client
+    c.post('/api/planner/activities', json=[_activity(id='a1'), _activity(id='a2')])
+    assert c.delete('/api/planner/a1').status_code == 204
+    assert c.delete('/api/planner/a1').status_code == 404
+    assert c.delete('/api/planner/activities').status_code == 204
+    assert c.get('/api/planner/activities').get_json()['data'] == []
+
+
+def test_list_endpoints_issue_a_single_select(client, record_statements):
+    c, app = client
+    c.post('/api/planner/activities', json=[_activity(id=f'a{i}') for i in range(25)])
+    c.post('/api/planner/courses/sync', json=[{'id': f'c{i}', 'title': 'Kurs'} for i in range(25)])
+    c.get('/api/planner/activities')  # värmer user-cachen
+
+    with record_statements(app) as statements:
+        assert len(c.get('/api/planner/activities').get_json()['data']) == 25
+        assert len(c.get('/api/planner/courses').get_json()['data']) == 25
+    assert len([s for s in statements if s.lstrip().upper().startswith('SELECT')]) == 2
@@ -0,0 +1,205 @@
+import os
+import sys
+import uuid
+import jwt
+import pytest
+from flask import Flask
+from sqlalchemy.pool import StaticPool
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.db_config import db
+from api.schedule_routes import schedule_bp
+from models.user import User
+import models.calendar  # noqa: F401
+from config.settings import SECRET_KEY
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'poolclass': StaticPool,
+        'connect_args': {'check_same_thread': False},
+    }
+    app.config['SECRET_KEY'] = SECRET_KEY
+    # Oavsiktliga lazy loads på aktiviteter ska smälla i testerna
+    app.config['SQLA_RAISELOAD'] = True
+    db.init_app(app)
+    app.register_blueprint(schedule_bp, url_prefix='/api/schedule')
+
+    with app.app_context():
+        db.create_all()
+        user = User(id=User.generate_id(), username='tester')
+        user.set_password('pw')
+        db.session.add(user)
+        db.session.commit()
+        token = jwt.encode({'user_id': user.id}, SECRET_KEY, algorithm='HS256')
+    test_client = app.test_client()
+    test_client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    yield test_client, app
+
+
+def _member_ids(c):
+    return [m['id'] for m in c.get('/api/schedule/family-members').get_json()['data']]
+
+
+def _activity(**overrides):
+    payload = {
+        'name': 'Simning',
+        'icon': '🏊',
+        'days': ['Måndag', 'Tisdag', 'Onsdag'],
+        'week': 10,
+        'year': 2025,
+        'startTime': '16:00',
+        'endTime': '17:00',
+        'participants': [],
+    }
+    payload.update(overrides)
+    return payload
+
+
+def test_get_activities_loads_participants_in_one_query(client, record_statements):
+    c, app = client
+    members = _member_ids(c)
+    res = c.post('/api/schedule/activities', json=_activity(participants=members[:2]))
+    assert res.status_code == 201
+
+    with record_statements(app) as statements:
+        res = c.get('/api/schedule/activities', query_string={'year': 2025, 'week': 10})
+    data = res.get_json()['data']
+    assert len(data) == 3
+    assert all(sorted(a['participants']) == sorted(members[:2]) for a in data)
+    participant_selects = [s for s in statements if 'activity_participants' in s]
+    assert len(participant_selects) == 1
+
+
+def test_series_update_and_delete(client):
+    c, app = client
+    members = _member_ids(c)
+    c.post('/api/schedule/activities', json=_activity(participants=members[:1]))
+    series_id = c.get(
+        '/api/schedule/activities', query_string={'year': 2025, 'week': 10}
+    ).get_json()['data'][0]['seriesId']
+
+    res = c.put(
+        f'/api/schedule/activities/series/{series_id}',
+        json={'name': 'Dans', 'participants': members[1:3]},
+    )
+    assert res.status_code == 200
+    data = res.get_json()['data']
+    assert {a['name'] for a in data} == {'Dans'}
+    assert all(sorted(a['participants']) == sorted(members[1:3]) for a in data)
+
+    assert c.delete(f'/api/schedule/activities/series/{series_id}').status_code == 200
+    res = c.get('/api/schedule/activities', query_string={'year': 2025, 'week': 10})
+    assert res.get_json()['data'] == []
+
+
+def test_create_resolves_participants_without_per_instance_queries(client, record_statements):
+    c, app = client
+    members = _member_ids(c)
+    with record_statements(app) as statements:
+        res = c.post(
+            '/api/schedule/activities',
+            json=_activity(participants=[members[0], members[0], 'okänd', members[1]]),
+        )
+    assert res.status_code == 201
+    member_selects = [s for s in statements if 'FROM family_member' in s]
+    assert len(member_selects) == 1
+    assert 'family_member.color' not in member_selects[0]
+
+    data = c.get('/api/schedule/activities', query_string={'year': 2025, 'week': 10}).get_json()['data']
+    assert len(data) == 3
+    assert all(sorted(a['participants']) == sorted(members[:2]) for a in data)
+
+
+def test_time_validation(client):
+    c, app = client
+    for start, end in (('25:00', '26:00'), (['16:00'], '17:00'), ('16-00', '17:00'), ('17:00', '16:00')):
+        res = c.post('/api/schedule/activities', json=_activity(startTime=start, endTime=end))
+        assert res.status_code == 400
+    res = c.post('/api/schedule/activities', json=_activity(startTime='9:30', endTime='10:15', days=['Fredag']))
+    assert res.status_code == 201
+    data = c.get('/api/schedule/activities', query_string={'year': 2025, 'week': 10}).get_json()['data']
+    assert (data[0]['startTime'], data[0]['endTime']) == ('09:30', '10:15')
+
+
+def test_add_activities_bulk_inserts_instances_and_links(client):
+    c, app = client
+    members = _member_ids(c)
+    res = c.post('/api/schedule/add-activities', json={'activities': [
+        _activity(participants=members[:2]),
+        _activity(name='Fotboll', days=['Lördag'], participants=[members[2], 'okänd']),
+    ]})
+    assert res.status_code == 201
+    assert res.get_json()['data']['message'] == 'Activities added: 4'
+
+    data = c.get('/api/schedule/activities', query_string={'year': 2025, 'week': 10}).get_json()['data']
+    by_name = {}
+    for a in data:
+        by_name.setdefault(a['name'], []).append(a)
+    assert sorted(a['day'] for a in by_name['Simning']) == ['Måndag', 'Onsdag', 'Tisdag']
+    assert all(sorted(a['participants']) == sorted(members[:2]) for a in by_name['Simning'])
+    assert [a['participants'] for a in by_name['Fotboll']] == [[members[2]]]
+    ids = {a['id'] for a in data}
+    assert len(ids) == 4
+    assert all(str(uuid.UUID(i)) == i and uuid.UUID(i).version == 4 for i in ids)
+
+
+def test_add_activities_rejects_invalid_batch_without_writing(client):
+    c, app = client
+    res = c.post('/api/schedule/add-activities', json=[_activity(), _activity(startTime='x')])
+    assert res.status_code == 400
+    data = c.get('/api/schedule/activities', query_string={'year': 2025, 'week': 10}).get_json()['data']
+    assert data == []
+
+
+def test_create_without_participants_skips_member_query(client, record_statements):
+    c, app = client
+    _member_ids(c)
+    with record_statements(app) as statements:
+        res = c.post('/api/schedule/activities', json=_activity())
+    assert res.status_code == 201
+    assert not [s for s in statements if 'FROM family_member' in s]
+
+
+def test_update_activity_participants_ignores_foreign_ids(client):
+    c, app = client
+    members = _member_ids(c)
+    c.post('/api/schedule/activities', json=_activity(days=['Måndag']))
+    activity_id = c.get(
+        '/api/schedule/activities', query_string={'year': 2025, 'week': 10}
+    ).get_json()['data'][0]['id']
+    res = c.put(f'/api/schedule/activities/{activity_id}', json={'participants': [members[3], 'okänd']})
+    assert res.status_code == 200
+    assert res.get_json()['data']['participants'] == [members[3]]
+
+
+def test_day_normalization_accepts_names_and_numbers(client):
+    c, app = client
+    res = c.post('/api/schedule/activities', json=_activity(days=[' måndag ', 'TISDAG', 3, '4', '05']))
+    assert res.status_code == 201
+    data = c.get('/api/schedule/activities', query_string={'year': 2025, 'week': 10}).get_json()['data']
+    assert sorted(a['day'] for a in data) == sorted(['Måndag', 'Tisdag', 'Onsdag', 'Torsdag', 'Fredag'])
+    for bad in (8, 0, 1.0, 'Funday', '9', None):
+        assert c.post('/api/schedule/activities', json=_activity(days=[bad])).status_code == 400
+
+
+def test_create_recurring_activity_expands_until_end_date(client):
+    c, app = client
+    res = c.post('/api/schedule/activities', json=_activity(
+        days=['Måndag', 'Torsdag'], recurringEndDate='2025-03-17',
+    ))
+    assert res.status_code == 201
+    created = res.get_json()['data']
+    # Vecka 10 2025 börjar 3 mars: mån 3/3, tor 6/3, mån 10/3, tor 13/3, mån 17/3
+    assert [(a['week'], a['day']) for a in created] == [
+        (10, 'Måndag'), (10, 'Torsdag'), (11, 'Måndag'), (11, 'Torsdag'), (12, 'Måndag'),
+    ]
+    assert len({a['seriesId'] for a in created}) == 1
+
+    for bad in ('2025-02-30', '17/03/2025', '2025-03-02'):
+        assert c.post('/api/schedule/activities', json=_activity(recurringEndDate=bad)).status_code == 400